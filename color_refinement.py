@@ -17,28 +17,15 @@ def print_dot(filename, G):
 
 def get_neighbourhood(v):
     """
-    Get a sorted list of all the colors of all the neighbours
+    Get a sorted tuple of all the colors of all the neighbours, usable as dictionary key
     :param v: The vertex
-    :return: The sorted list
+    :return: The sorted tuple
     """
     result = []
     for n in v.neighbours:
         result.append(n.colornum)
     result.sort()
-    return result
-
-
-def get_colour_of_neighbourhood(n, lst):
-    """
-    Get the color for which the same colored neighbourhood is already in the list
-    :param n: List of neighbour colors
-    :param lst: The 'update-list' with the following tuples: (color, vertex, neighbourhood)
-    :return: the found color or -1
-    """
-    for i in range(len(lst)):
-        if lst[i][2] == n:
-            return lst[i][0]
-    return -1
+    return tuple(result)
 
 
 def refine_all(L):
@@ -65,11 +52,22 @@ def refine_colors(G, H):
     vertex_count = len(G)
     # Create a disjoint union of the first two graphs
     I = G + H
+    refine_union(I, vertex_count)
+    # The union consists of copies of the vertices, so copy their colors back to G and H
+    for v, copy in zip(G.vertex_view + H.vertex_view, I.vertex_view):
+        v.colornum = copy.colornum
 
+
+def refine_union(I, vertex_count):
+    """
+    Refines the colors of the disjoint union of two graphs and prints the verdict
+    :param I: The disjoint union of G and H
+    :param vertex_count: The number of vertices of G
+    """
     partitions = {}
     last_colour = 0
     # Initially color the vertices based on degree
-    for v in I.vertices:
+    for v in I.vertex_view:
         v.colornum = v.degree
         if last_colour < v.degree:
             last_colour = v.degree
@@ -92,19 +90,21 @@ def refine_colors(G, H):
         for p in list(partitions.keys()):
             partition = partitions[p]
             tmp = []  # list of (colour, vertex, neighbourhood)-tuples
+            new_colours = {}  # neighbourhood -> colour, numbered in order of first occurrence
+            kept = [partition[0]]
             n_u = get_neighbourhood(partition[0])
             for i in range(1, len(partition)):
                 n_v = get_neighbourhood(partition[i])
-                if not n_u == n_v:
-                    colour = get_colour_of_neighbourhood(n_v, tmp)
-                    if colour >= 0:
-                        tmp.append((colour, partition[i], n_v))
-                    else:
-                        tmp.append((last_colour, partition[i], n_v))
+                if n_u == n_v:
+                    kept.append(partition[i])
+                else:
+                    if n_v not in new_colours:
+                        new_colours[n_v] = last_colour
                         last_colour += 1
+                    tmp.append((new_colours[n_v], partition[i], n_v))
             # Update the dictionary and the vertices
+            partition[:] = kept
             for t in tmp:
-                partition.remove(t[1])
                 if t[0] in partitions:
                     partitions[t[0]].append(t[1])
                 else:
@@ -132,15 +132,15 @@ def verify_colors(G, H):
     """
     G_list = set()
     H_list = set()
-    for G_v in G.vertices:
+    for G_v in G.vertex_view:
         G_list.add(G_v.colornum)
-        for H_v in H.vertices:
+        for H_v in H.vertex_view:
             H_list.add(H_v.colornum)
             if G_v.colornum == H_v.colornum:
                 if not get_neighbourhood(G_v) == get_neighbourhood(H_v):
                     print (False)
                     return
-    if len(G_list) == len(G.vertices) and len(H_list) == len(H.vertices) and G_list == H_list:
+    if len(G_list) == len(G) and len(H_list) == len(H) and G_list == H_list:
         print (True)
         return
     print ("Maybe", False)
@@ -44,21 +44,8 @@ def get_copied_vertex(original, copy, vertex):
     :param copy: Copy of the graph
     :return: The sorted list
     """
-    index = original.vertices.index(vertex)
-    return copy.vertices[index]
-
-
-def get_color_of_neighbourhood(n, lst):
-    """
-    Get the color for which the same colored neighbourhood is already in the list
-    :param n: List of neighbour colors
-    :param lst: The 'update-list' with the following tuples: (color, vertex, neighbourhood)
-    :return: the found color or -1
-    """
-    for i in range(len(lst)):
-        if lst[i][NEIGHBOURS] == n:
-            return lst[i][COLOR]
-    return UNKNOWN
+    index = original.index_of(vertex)
+    return copy.vertex_view[index]
 
 
 def refine_all(L):
@@ -93,10 +80,10 @@ def get_partition(G, H):
     """
     result = dict()
     # graph G
-    for vG in G.vertices:
+    for vG in G.vertex_view:
         insert_into_dictionary(result, vG.colornum, vG)
     # graph H
-    for vH in H.vertices:
+    for vH in H.vertex_view:
         insert_into_dictionary(result, vH.colornum, vH)
     return result
 
@@ -134,7 +121,7 @@ def initial_coloring(G):
     Calculates the initial coloring based on the degrees of the vertices on a graph
     :param G: The graph
     """
-    for v in G.vertices:
+    for v in G.vertex_view:
         v.colornum = v.degree
 
 
@@ -162,7 +149,7 @@ def coarsest_stable_coloring(G, H):
         # Make sets Di = vertices with i neighbours in C (invert the no_of_neighbours dictionary)
         no_of_neighbours = count_incidents_with_color_class(color_class)
         D = dict()
-        for v in G.vertices + H.vertices:
+        for v in G.vertex_view + H.vertex_view:
             v_neighbours = no_of_neighbours[v] if v in no_of_neighbours.keys() else 0  # ternary assignment
             insert_into_dictionary(D, v_neighbours, v)
 
@@ -198,14 +185,14 @@ def coarsest_stable_coloring(G, H):
                     queue.append(smallest_color)
                 else:
                     enqueue_once(C_prime, queue, visited_color_class_ids)
-                if len(partition) == len(G.vertices):
+                if len(partition) == len(G):
                     return YES, partition
 
     result = MAYBE
     for p in partition:
         if len(partition[p]) % 2 != 0:
             result = NO
-    if len(partition) == len(G.vertices):
+    if len(partition) == len(G):
         result = YES
     return (result, partition)
 
@@ -245,7 +232,7 @@ def find_isomorphisms(G, H):
     :param H: The graph H
     :return: The number of isomorphisms
     """
-    if not (len(G.vertices) == len(H.vertices)):
+    if not (len(G) == len(H)):
         return NO
     return count_isomorphisms(G, H, [], [])
 
@@ -286,8 +273,8 @@ def verify_colors(G, H):
     :param H: The graph H
     :return: Whether the resulting coloring is a bijection or not
     """
-    for G_v in G.vertices:
-        for H_v in H.vertices:
+    for G_v in G.vertex_view:
+        for H_v in H.vertex_view:
             if G_v.colornum == H_v.colornum:
                 if not get_neighbourhood_colors(G_v) == get_neighbourhood_colors(H_v):
                     return False
@@ -4,6 +4,7 @@ This is a module for working with directed and undirected multigraphs.
 # version: 29-01-2015, Paul Bonsma
 # version: 01-02-2017, Pieter Bos, Tariq Bontekoe
 
+from collections.abc import Sequence
 from typing import List, Union, Set
 
 
@@ -21,12 +22,87 @@ class GraphError(Exception):
         super(GraphError, self).__init__(message)
 
 
-class Vertex(object):
+class ListView(Sequence):
     """
-    `Vertex` objects have a property `graph` pointing to the graph they are part of,
+    Read-only view of a list, with which a `Graph` exposes its vertices and edges without copying them.
+    The view follows later changes of the list.
+    """
+    __slots__ = ('_items', '_index')
+
+    def __init__(self, items: list, index: dict = None):
+        """
+        Creates a view of `items`
+        :param items: The list
+        :param index: Optional dictionary that maps every item to its position in the list,
+        for constant time `in` and `index`
+        """
+        self._items = items
+        self._index = index
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the view.
+        :return: The string to approximate the constructor arguments of the `ListView'
+        """
+        return 'ListView({!r})'.format(self._items)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of items
+        """
+        return len(self._items)
+
+    def __getitem__(self, i):
+        """
+        :param i: The position, or a slice
+        :return: The item at position `i`, or a list of the items in the slice
+        """
+        return self._items[i]
+
+    def __iter__(self):
+        """
+        :return: An iterator over the items
+        """
+        return iter(self._items)
+
+    def __contains__(self, item) -> bool:
+        """
+        :param item: The item
+        :return: Whether the item is in the list
+        """
+        if self._index is not None:
+            return item in self._index
+        return item in self._items
+
+    def __add__(self, other) -> list:
+        """
+        Concatenates the items with those of another sequence
+        :param other: The other sequence
+        :return: A new list
+        """
+        return self._items + list(other)
+
+    def index(self, item, *args) -> int:
+        """
+        Returns the position of an item
+        :param item: The item
+        :return: The position
+        """
+        if self._index is not None and not args:
+            if item not in self._index:
+                raise ValueError('{} is not in the list'.format(item))
+            return self._index[item]
+        return self._items.index(item, *args)
+
+
+class BaseVertex(object):
+    """
+    The methods shared by `Vertex` and `SlotVertex`.
+    Vertices have a property `graph` pointing to the graph they are part of,
     and an attribute `label` which can be anything: it is not used for any methods,
     except for `__str__`.
     """
+    __slots__ = ()
 
     def __init__(self, graph: "Graph", label=None):
         """
@@ -113,13 +189,41 @@ class Vertex(object):
         return sum(map(len, self._incidence.values()))
 
 
-class Edge(object):
+class Vertex(BaseVertex):
+    """
+    `Vertex` objects have a property `graph` pointing to the graph they are part of,
+    and an attribute `label` which can be anything: it is not used for any methods,
+    except for `__str__`. Other attributes, such as `colornum`, can be added freely.
+    """
+
+
+class SlotVertex(BaseVertex):
+    """
+    Lightweight vertex without an instance dictionary. Its attributes, including the color
+    `colornum`, are stored in slots, which saves memory and speeds up attribute access;
+    no other attributes can be added.
+    """
+    __slots__ = ('_graph', 'label', '_incidence', 'colornum')
+
+    def __init__(self, graph: "Graph", label=None):
+        """
+        Creates a vertex with color 0, see `Vertex`
+        :param graph: The graph that this `SlotVertex` is a part of
+        :param label: Optional parameter to specify a label for the vertex
+        """
+        super(SlotVertex, self).__init__(graph, label)
+        self.colornum = 0
+
+
+class BaseEdge(object):
     """
+    The methods shared by `Edge` and `SlotEdge`.
     Edges have properties `tail` and `head` which point to the end vertices
     (`Vertex` objects). The order of these matters when the graph is directed.
     """
+    __slots__ = ()
 
-    def __init__(self, tail: Vertex, head: Vertex, weight=None):
+    def __init__(self, tail: BaseVertex, head: BaseVertex, weight=None):
         """
         Creates an edge between vertices `tail` and `head`
         :param tail: In case the graph is directed, this is the tail of the arrow.
@@ -171,7 +275,7 @@ class Edge(object):
         """
         return self._weight
 
-    def other_end(self, vertex: Vertex) -> Vertex:
+    def other_end(self, vertex: BaseVertex) -> BaseVertex:
         """
         Given one end `vertex` of the edge, this returns
         the other end vertex.
@@ -186,7 +290,7 @@ class Edge(object):
         raise GraphError(
             'edge.other_end(vertex): vertex must be head or tail of edge')
 
-    def incident(self, vertex: Vertex) -> bool:
+    def incident(self, vertex: BaseVertex) -> bool:
         """
         Returns True iff the edge is incident with the
         vertex.
@@ -196,7 +300,53 @@ class Edge(object):
         return self.head == vertex or self.tail == vertex
 
 
+class Edge(BaseEdge):
+    """
+    Edges have properties `tail` and `head` which point to the end vertices
+    (`Vertex` objects). The order of these matters when the graph is directed.
+    """
+
+
+class SlotEdge(BaseEdge):
+    """
+    Lightweight edge without an instance dictionary, see `SlotVertex`
+    """
+    __slots__ = ('_tail', '_head', '_weight')
+
+
+def matrix_entries(matrix, n: int = None):
+    """
+    Lists the nonzero entries of an adjacency matrix, which may be a list of lists (see
+    `Graph.to_matrix`), a NumPy array, a `scipy.sparse` matrix, or a tuple of NumPy arrays
+    (data, (row, col)) or (data, indices, indptr) (see `Graph.to_sparse_matrix`)
+    :param matrix: The adjacency matrix
+    :param n: The number of rows, only needed for a (data, (row, col)) tuple with empty last rows
+    :return: Tuple (number of rows, list of (row, column)-tuples)
+    """
+    if isinstance(matrix, tuple) and len(matrix) == 3:
+        data, indices, indptr = matrix
+        rows = [i for i in range(len(indptr) - 1) for k in range(indptr[i], indptr[i + 1])]
+        return len(indptr) - 1, [(i, int(j)) for i, j, x in zip(rows, indices, data) if x]
+    if isinstance(matrix, tuple):
+        data, (row, col) = matrix
+        entries = [(int(i), int(j)) for i, j, x in zip(row, col, data) if x]
+        if n is None:
+            n = max((max(e) for e in entries), default=-1) + 1
+        return n, entries
+    if hasattr(matrix, 'tocoo'):
+        coo = matrix.tocoo()
+        return coo.shape[0], [(int(i), int(j)) for i, j, x in zip(coo.row, coo.col, coo.data) if x]
+    if hasattr(matrix, 'nonzero'):
+        row, col = matrix.nonzero()
+        return matrix.shape[0], list(zip(row.tolist(), col.tolist()))
+    return len(matrix), [(i, j) for i, line in enumerate(matrix) for j, x in enumerate(line) if x]
+
+
 class Graph(object):
+    # The classes of the vertices and edges created by the graph itself and by graph_io
+    vertex_class = Vertex
+    edge_class = Edge
+
     def __init__(self, directed: bool, n: int=0, simple: bool=False):
         """
         Creates a graph.
@@ -206,12 +356,15 @@ class Graph(object):
         """
         self._v = list()
         self._e = list()
+        self._index = dict()  # Vertex -> its position in _v, for constant time membership tests
+        self._vertex_view = ListView(self._v, self._index)
+        self._edge_view = ListView(self._e)
         self._simple = simple
         self._directed = directed
         self._next_label_value = 0
 
         for i in range(n):
-            self.add_vertex(Vertex(self))
+            self.add_vertex(self.vertex_class(self))
 
     def __repr__(self):
         """
@@ -267,6 +420,30 @@ class Graph(object):
         """
         return list(self._e)
 
+    @property
+    def vertex_view(self) -> ListView:
+        """
+        :return: Read-only view of the vertices of the graph, in order, without copying them
+        """
+        return self._vertex_view
+
+    @property
+    def edge_view(self) -> ListView:
+        """
+        :return: Read-only view of the edges of the graph, in order, without copying them
+        """
+        return self._edge_view
+
+    def index_of(self, vertex: "Vertex") -> int:
+        """
+        Returns the position of a vertex in the vertices of the graph
+        :param vertex: The vertex
+        :return: The position
+        """
+        if vertex not in self._index:
+            raise GraphError('graph.index_of(vertex): vertex must belong to the graph')
+        return self._index[vertex]
+
     def __iter__(self):
         """
         :return: Returns an iterator for the vertices of the graph
@@ -287,6 +464,7 @@ class Graph(object):
         if vertex.graph != self:
             raise GraphError("A vertex must belong to the graph it is added to")
 
+        self._index[vertex] = len(self._v)
         self._v.append(vertex)
 
     def add_edge(self, edge: "Edge"):
@@ -303,9 +481,9 @@ class Graph(object):
             if self.is_adjacent(edge.tail, edge.head):
                 raise GraphError('No multiedges allowed in simple graphs')
 
-        if edge.tail not in self._v:
+        if edge.tail not in self._index:
             self.add_vertex(edge.tail)
-        if edge.head not in self._v:
+        if edge.head not in self._index:
             self.add_vertex(edge.head)
 
         self._e.append(edge)
@@ -315,43 +493,36 @@ class Graph(object):
 
     def __add__(self, other: "Graph") -> "Graph":
         """
-        Make a disjoint union of two graphs.
+        Make a disjoint union of two graphs. The operands are not changed: the vertices of the
+        result are copies of the vertices of `self' followed by those of `other', in order,
+        with the same labels and colors.
         :param other: Graph to add to `self'.
         :return: New graph which is a disjoint union of `self' and `other'.
         """
-        result = Graph(False, 0)
-        vertex_list = []
-        edge_list = []
-		
-        for ov in other.vertices:
-            ov._graph = result
-            vertex_list.append(ov)
-        for sv in self.vertices:
-            if not (sv in vertex_list):
-                sv._graph = result
-                vertex_list.append(sv)
-        for oe in other.edges:
-            edge_list.append(oe)
-        for se in self.edges:
-            if not (se in edge_list):
-                edge_list.append(se)
-        for v in vertex_list:
-            result += v
-        for e in edge_list:
-            result += e
+        result = type(self)(False)
+        for graph in (self, other):
+            copies = dict()
+            for v in graph.vertices:
+                copy = result.vertex_class(result, v.label)
+                if hasattr(v, 'colornum'):
+                    copy.colornum = v.colornum
+                result.add_vertex(copy)
+                copies[v] = copy
+            for e in graph.edges:
+                result.add_edge(result.edge_class(copies[e.tail], copies[e.head], e.weight))
 
         return result
 
-    def __iadd__(self, other: Union[Edge, Vertex]) -> "Graph":
+    def __iadd__(self, other: Union[BaseEdge, BaseVertex]) -> "Graph":
         """
         Add either an `Edge` or `Vertex` with the += syntax.
         :param other: The object to be added
         :return: The modified graph
         """
-        if isinstance(other, Vertex):
+        if isinstance(other, BaseVertex):
             self.add_vertex(other)
 
-        if isinstance(other, Edge):
+        if isinstance(other, BaseEdge):
             self.add_edge(other)
 
         return self
@@ -385,35 +556,94 @@ class Graph(object):
         Returns a deepcopy of the graph
         """
         dictionary = dict()
-        newG = Graph(self.directed)
+        newG = type(self)(self.directed)
         for v in self.vertices:
-            newV = Vertex(newG)
+            newV = self.vertex_class(newG)
             newV.colornum = v.colornum
             newG += newV
             dictionary[v] = newV
         for e in self.edges:
-            newE = Edge(dictionary[e.tail], dictionary[e.head])
+            newE = self.edge_class(dictionary[e.tail], dictionary[e.head])
             newG += newE
         return newG
 
     def to_matrix(self):
-        # Create a mapping of the vertices to matrix indices
-        last_index = 0
-        self.vertex_mapping = dict()
-        vertex_count = len(self.vertices)
+        """
+        Returns the adjacency matrix of the graph as a list of lists. Row and column i belong to the
+        i-th vertex of `vertex_view`. For large graphs, see `to_sparse_matrix`.
+        :return: The adjacency matrix
+        """
+        vertex_count = len(self._v)
         matrix = [[0 for x in range(vertex_count)] for y in range(vertex_count)]
-        for v in self.vertices:
-            self.vertex_mapping[v] = last_index
-            last_index += 1
         # Build the adjacency matrix
-        for v in self.vertices:
-            v_index = self.vertex_mapping[v]
+        for v in self._v:
+            v_index = self._index[v]
             for w in v.neighbours:
-                w_index = self.vertex_mapping[w]
+                w_index = self._index[w]
                 matrix[v_index][w_index] = 1
                 matrix[w_index][v_index] = 1
         return matrix
 
+    def edge_arrays(self):
+        """
+        Returns the end points of the edges as NumPy arrays of vertex positions (see `index_of`)
+        :return: Tuple (tails, heads) of integer arrays
+        """
+        import numpy as np
+        tails = np.fromiter((self._index[e.tail] for e in self._e), dtype=np.intp, count=len(self._e))
+        heads = np.fromiter((self._index[e.head] for e in self._e), dtype=np.intp, count=len(self._e))
+        return tails, heads
+
+    def to_sparse_matrix(self, format: str = 'csr'):
+        """
+        Returns the adjacency matrix of the graph with the entries of `to_matrix`, in memory linear in the
+        number of edges. With SciPy this is a `scipy.sparse` matrix. Without SciPy it is the tuple of NumPy
+        arrays that the SciPy constructor of the format accepts: (data, (row, col)) for 'coo' and
+        (data, indices, indptr) for 'csr'.
+        :param format: 'csr' or 'coo'
+        :return: The sparse matrix
+        """
+        import numpy as np
+        if format not in ('csr', 'coo'):
+            raise GraphError('graph.to_sparse_matrix(format): format must be csr or coo')
+        try:
+            from scipy import sparse
+        except ImportError:
+            sparse = None
+        n = len(self._v)
+        tails, heads = self.edge_arrays()
+        # Like to_matrix, enter every edge in both directions and multi-edges only once
+        keys = np.unique(np.concatenate((tails * n + heads, heads * n + tails)))
+        row, col = np.divmod(keys, max(n, 1))
+        data = np.ones(len(keys), dtype=np.int8)
+        if format == 'coo':
+            if sparse is None:
+                return data, (row, col)
+            return sparse.coo_matrix((data, (row, col)), shape=(n, n))
+        indptr = np.searchsorted(row, np.arange(n + 1))
+        if sparse is None:
+            return data, col, indptr
+        return sparse.csr_matrix((data, col, indptr), shape=(n, n))
+
+    @classmethod
+    def from_matrix(cls, matrix, directed: bool = False, n: int = None) -> "Graph":
+        """
+        Builds a graph from an adjacency matrix (see `matrix_entries`). Vertex i belongs to row and
+        column i, and every nonzero entry gives an edge; undirected graphs only use the entries
+        on and above the diagonal.
+        :param matrix: The adjacency matrix
+        :param directed: Whether the graph should behave as a directed graph
+        :param n: The number of vertices, only needed for a (data, (row, col)) tuple with isolated vertices
+        :return: The graph
+        """
+        n, entries = matrix_entries(matrix, n)
+        graph = cls(directed, n)
+        vertices = graph.vertex_view
+        for i, j in entries:
+            if directed or i <= j:
+                graph.add_edge(graph.edge_class(vertices[i], vertices[j]))
+        return graph
+
 
 class UnsafeGraph(Graph):
     @property
@@ -425,6 +655,7 @@ class UnsafeGraph(Graph):
         return self._e
 
     def add_vertex(self, vertex: "Vertex"):
+        self._index[vertex] = len(self._v)
         self._v.append(vertex)
 
     def add_edge(self, edge: "Edge"):
@@ -453,3 +684,11 @@ class UnsafeGraph(Graph):
 
     def is_adjacent(self, u: "Vertex", v: "Vertex") -> bool:
         return v in u._incidence or (not self._directed and u in v._incidence)
+
+
+class SlotGraph(UnsafeGraph):
+    """
+    `UnsafeGraph` of `SlotVertex` and `SlotEdge` objects, for large graphs
+    """
+    vertex_class = SlotVertex
+    edge_class = SlotEdge
@@ -0,0 +1,161 @@
+"""
+Adjacency of graphs as bitsets, for dense graphs. The neighbourhood of vertex v is a Python int
+whose bit w is set iff v and w are adjacent, so adjacency tests and the number of neighbours of a
+vertex in a set of vertices (popcount(row & mask)) take a few word-parallel operations
+instead of a loop over the edges.
+Bitsets cannot represent multi-edges; see `is_simple`.
+"""
+from csr_graph import CSRGraph
+
+# Minimal density (edges / possible edges) for which bitsets pay off in the refinement
+BITSET_DENSITY = 0.25
+# Translates a bytearray of zeros and ones into binary digits
+BINARY_DIGITS = bytes.maketrans(b'\0\1', b'01')
+
+
+if hasattr(int, 'bit_count'):
+    # Python 3.10 and later
+    popcount = int.bit_count
+else:
+    def popcount(x: int) -> int:
+        """
+        Counts the set bits of a non-negative int
+        :param x: The int
+        :return: The number of set bits
+        """
+        return bin(x).count('1')
+
+
+def iter_bits(x: int):
+    """
+    Iterates over the set bits of a non-negative int, from low to high
+    :param x: The int
+    :return: Iterator of bit positions
+    """
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+
+def vertex_mask(vertices, n: int) -> int:
+    """
+    Returns the bitset of a set of vertices. It is parsed from a string of binary digits, which
+    takes linear time, while setting the bits of an int one by one takes quadratic time.
+    :param vertices: Iterable of vertices
+    :param n: The number of vertices of the graph
+    :return: The bitset
+    """
+    digits = bytearray(n)
+    for v in vertices:
+        digits[v] = 1
+    return int(digits.translate(BINARY_DIGITS)[::-1], 2) if n > 0 else 0
+
+
+class BitsetGraph(object):
+    """
+    An undirected simple graph on the vertices 0, ..., n - 1, stored as one bitset per vertex.
+    """
+    __slots__ = ('_n', '_rows')
+
+    def __init__(self, n: int, rows):
+        """
+        Creates a graph from already built rows. Use `from_graph` instead.
+        :param n: The number of vertices
+        :param rows: List with the neighbourhood bitset of every vertex
+        """
+        self._n = n
+        self._rows = rows
+
+    @classmethod
+    def from_graph(cls, G) -> "BitsetGraph":
+        """
+        Builds the bitsets of a graph. Multi-edges are merged.
+        :param G: The graph (`graph.Graph` or `csr_graph.CSRGraph`)
+        :return: The graph as bitsets
+        """
+        graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+        n = len(graph)
+        return cls(n, [vertex_mask(graph.neighbours_of(v), n) for v in range(n)])
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the graph.
+        :return: The string to approximate the constructor arguments of the `BitsetGraph'
+        """
+        return 'BitsetGraph(#edges={}, #vertices={})'.format(self.edge_count, self._n)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of vertices of the graph
+        """
+        return self._n
+
+    @property
+    def rows(self):
+        """
+        :return: List with the neighbourhood bitset of every vertex
+        """
+        return self._rows
+
+    @property
+    def edge_count(self) -> int:
+        """
+        :return: The number of edges of the graph
+        """
+        loops = sum(1 for v in range(self._n) if self._rows[v] >> v & 1)
+        return (sum(map(popcount, self._rows)) + loops) // 2
+
+    def is_adjacent(self, u: int, v: int) -> bool:
+        """
+        Returns True iff vertices `u` and `v` are adjacent
+        :param u: One vertex
+        :param v: The other vertex
+        """
+        return bool(self._rows[u] >> v & 1)
+
+    def degree(self, v: int) -> int:
+        """
+        Returns the degree of vertex `v`
+        :param v: The vertex
+        """
+        return popcount(self._rows[v])
+
+    def neighbours_of(self, v: int):
+        """
+        Returns the neighbours of vertex `v`
+        :param v: The vertex
+        :return: Iterator of the neighbours, in increasing order
+        """
+        return iter_bits(self._rows[v])
+
+    def count_neighbours(self, v: int, mask: int) -> int:
+        """
+        Counts the neighbours of vertex `v` in a set of vertices
+        :param v: The vertex
+        :param mask: The bitset of the set (see vertex_mask)
+        :return: The number of neighbours
+        """
+        return popcount(self._rows[v] & mask)
+
+
+def is_simple(graph) -> bool:
+    """
+    Checks whether a graph in CSR form has no multi-edges, so that its bitsets represent it exactly
+    :param graph: The graph in CSR form
+    """
+    for v in range(len(graph)):
+        neighbours = graph.neighbours_of(v)
+        if len(set(neighbours)) != len(neighbours):
+            return False
+    return True
+
+
+def is_dense(graph) -> bool:
+    """
+    Checks whether the bitset backend pays off for a graph in CSR form
+    :param graph: The graph in CSR form
+    :return: Whether the density of the graph is at least BITSET_DENSITY
+    """
+    n = len(graph)
+    return n > 1 and len(graph.neighbours) >= BITSET_DENSITY * n * (n - 1)
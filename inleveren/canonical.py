@@ -0,0 +1,149 @@
+"""
+Canonical labelling of graphs by individualisation refinement.
+Two graphs are isomorphic iff their certificates (canonical forms) are equal, so the isomorphism
+classes of a list of graphs follow from one canonical form per graph and a dictionary lookup.
+"""
+from csr_graph import CSRGraph
+from permutation_group import get_orbit
+import refinement
+
+
+def get_certificate(graph, colors, labelling):
+    """
+    Returns the certificate of a graph with a given labelling of its vertices: the number of
+    vertices, the colors and the edges, both in the order of the labels.
+    :param graph: The graph in CSR form
+    :param colors: The initial coloring
+    :param labelling: List with the label (0, ..., n - 1) of every vertex
+    :return: The certificate, a tuple of ints and tuples
+    """
+    n = len(graph)
+    ordered_colors = [0] * n
+    for v in range(n):
+        ordered_colors[labelling[v]] = colors[v]
+    offsets, neighbours = graph.offsets, graph.neighbours
+    edges = []
+    for u in range(n):
+        label = labelling[u]
+        edges += [label * n + labelling[w] for w in neighbours[offsets[u]:offsets[u + 1]] if label <= labelling[w]]
+    edges.sort()
+    return n, tuple(ordered_colors), tuple(edges)
+
+
+class CanonicalSearch(object):
+    """
+    State of the search for the canonical form: the partition, the vertices individualised on the
+    current path with the refinement trace of every level, the first and the best leaf found so far,
+    and the automorphisms found by comparing leaves.
+
+    The canonical form is the largest (traces, certificate) pair over all leaves. Subtrees whose traces
+    are smaller than those of the best leaf are pruned. When a leaf has the same certificate as the
+    first or the best leaf, the two give an automorphism, and the search returns to the common ancestor
+    of both leaves, because the rest of the current subtree is equivalent to one explored before.
+    """
+
+    def __init__(self, graph, colors):
+        """
+        Prepares the search
+        :param graph: The graph in CSR form
+        :param colors: The initial coloring
+        """
+        self.graph = graph
+        self.colors = colors
+        self.partition = refinement.new_partition(graph, colors)
+        self.path = []
+        self.traces = []
+        self.first = None
+        self.best = None
+        self.generators = []
+        self.stabilisers = [([], 0)]
+
+    def run(self):
+        """
+        Runs the search
+        :return: The canonical form
+        """
+        self.partition.refine()
+        self._search()
+        return self.best[:2]
+
+    def _leaf(self):
+        """
+        For internal use only; handles a discrete partition
+        :return: The level to return to
+        """
+        labelling = self.partition.colors()
+        leaf = (tuple(self.traces), get_certificate(self.graph, self.colors, labelling), labelling, list(self.path))
+        if self.first is None:
+            self.first = leaf
+        for other in (self.first, self.best):
+            if other is not None and leaf[1] == other[1] and labelling != other[2]:
+                # Both labellings give the same graph, which yields an automorphism
+                inverse = [0] * len(labelling)
+                for v in range(len(labelling)):
+                    inverse[other[2][v]] = v
+                self.generators.append([inverse[labelling[v]] for v in range(len(labelling))])
+                common = 0
+                while self.path[common] == other[3][common]:
+                    common += 1
+                return common
+        if self.best is None or leaf[:2] > self.best[:2]:
+            self.best = leaf
+        return len(self.path)
+
+    def _search(self):
+        """
+        For internal use only; searches the subtree of the current partition. Of the vertices
+        in the target cell, only one per orbit of the automorphisms that fix the current path is tried.
+        :return: The level to return to
+        """
+        if len(self.partition) == len(self.graph):
+            return self._leaf()
+        level = len(self.path)
+        # Cells are numbered invariantly, so this choice does not depend on the numbering of the vertices
+        cell = self.partition.cell(self.partition.first_nontrivial_cell())
+        # Automorphisms fixing the path: those of the parent fixing the last vertex, and new ones
+        parent, known = self.stabilisers[-1]
+        stabiliser = [g for g in parent if g[self.path[-1]] == self.path[-1]] if self.path else list(parent)
+        tried = []
+        pruned = set()
+        for x in sorted(cell):
+            if known != len(self.generators):
+                stabiliser += [g for g in self.generators[known:] if all(g[v] == v for v in self.path)]
+                known = len(self.generators)
+                pruned = set()
+                for t in tried:
+                    pruned |= get_orbit(stabiliser, t)
+            if x in pruned:
+                continue
+            tried.append(x)
+            pruned |= get_orbit(stabiliser, x)
+            mark = self.partition.mark()
+            self.partition.individualise(x)
+            self.path.append(x)
+            self.traces.append(tuple(self.partition.trail[mark[0]:]))
+            self.stabilisers.append((stabiliser, known))
+            jump = level
+            if self.best is None or tuple(self.traces) >= self.best[0][:level + 1]:
+                jump = self._search()
+            self.stabilisers.pop()
+            self.traces.pop()
+            self.path.pop()
+            self.partition.undo(mark)
+            if jump < level:
+                return jump
+        return level
+
+
+def canonical_form(G, colors=None):
+    """
+    Computes the canonical form of a graph: two graphs are isomorphic iff their canonical forms are equal
+    :param G: The graph (`graph.Graph` or `csr_graph.CSRGraph`)
+    :param colors: Optional initial coloring; vertices with different colors are never mapped onto
+    each other. The colors are part of the canonical form and have to be comparable.
+    :return: The canonical form, a hashable tuple
+    """
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    if colors is None:
+        colors = refinement.initial_coloring(graph)
+    return CanonicalSearch(graph, list(colors)).run()
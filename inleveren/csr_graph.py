@@ -0,0 +1,170 @@
+"""
+Compact, immutable graph representation in compressed sparse row (CSR) form.
+The vertices are the integers 0, ..., n - 1. The neighbours of vertex v are stored in
+`neighbours[offsets[v]:offsets[v + 1]]`.
+"""
+from array import array
+from typing import Iterator, Tuple
+
+from graph import matrix_entries
+
+# Type code of the flat integer arrays
+TYPECODE = 'i'
+
+
+class CSRGraph(object):
+    """
+    An undirected graph stored as two flat integer arrays: `offsets` (of length n + 1) and
+    `neighbours` (of length 2m). Multi-edges occur multiple times in the neighbour array,
+    loops occur once, so that `degree` agrees with `graph.Vertex.degree`.
+    """
+    __slots__ = ('_n', '_offsets', '_neighbours')
+
+    def __init__(self, n: int, offsets, neighbours):
+        """
+        Creates a graph from already built CSR arrays. Use `from_edges` or `from_graph` instead.
+        :param n: The number of vertices
+        :param offsets: Array of length n + 1 with the start of the neighbours of each vertex
+        :param neighbours: Array with the concatenated neighbour lists
+        The arrays may also be memoryviews of ints, for example of a memory-mapped file (see graph_cache.py).
+        """
+        self._n = n
+        self._offsets = offsets
+        self._neighbours = neighbours
+
+    @classmethod
+    def from_edges(cls, n: int, edges) -> "CSRGraph":
+        """
+        Builds a graph from an edge list.
+        :param n: The number of vertices
+        :param edges: Iterable of (tail, head) or (tail, head, weight) tuples with vertex numbers
+        :return: The graph
+        """
+        edges = [(e[0], e[1]) for e in edges]
+        degrees = [0] * n
+        for u, v in edges:
+            degrees[u] += 1
+            if u != v:
+                degrees[v] += 1
+
+        offsets = array(TYPECODE, [0]) * (n + 1)
+        for v in range(n):
+            offsets[v + 1] = offsets[v] + degrees[v]
+
+        position = list(offsets[:n])
+        neighbours = array(TYPECODE, [0]) * offsets[n]
+        for u, v in edges:
+            neighbours[position[u]] = v
+            position[u] += 1
+            if u != v:
+                neighbours[position[v]] = u
+                position[v] += 1
+
+        return cls(n, offsets, neighbours)
+
+    @classmethod
+    def from_graph(cls, graph) -> "CSRGraph":
+        """
+        Builds a graph from a `graph.Graph`. Vertex i is the i-th vertex of `graph.vertex_view`.
+        :param graph: The graph
+        :return: The graph in CSR form
+        """
+        index = {v: i for i, v in enumerate(graph.vertex_view)}
+        return cls.from_edges(len(index), ((index[e.tail], index[e.head]) for e in graph.edge_view))
+
+    @classmethod
+    def from_matrix(cls, matrix, n: int = None) -> "CSRGraph":
+        """
+        Builds a graph from a symmetric adjacency matrix, see `graph.matrix_entries`.
+        Every nonzero entry on or above the diagonal gives an edge.
+        :param matrix: The adjacency matrix
+        :param n: The number of vertices, only needed for a (data, (row, col)) tuple with isolated vertices
+        :return: The graph in CSR form
+        """
+        n, entries = matrix_entries(matrix, n)
+        return cls.from_edges(n, [(i, j) for i, j in entries if i <= j])
+
+    def __reduce__(self):
+        """
+        Pickles the graph as its two arrays, for sending it to other processes
+        :return: Tuple (class, constructor arguments)
+        """
+        return CSRGraph, (self._n, array(TYPECODE, self._offsets), array(TYPECODE, self._neighbours))
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the graph.
+        :return: The string to approximate the constructor arguments of the `CSRGraph'
+        """
+        return 'CSRGraph(#edges={}, #vertices={})'.format(self.edge_count, self._n)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of vertices of the graph
+        """
+        return self._n
+
+    @property
+    def offsets(self):
+        """
+        :return: The offset array, of length n + 1
+        """
+        return self._offsets
+
+    @property
+    def neighbours(self):
+        """
+        :return: The concatenated neighbour lists
+        """
+        return self._neighbours
+
+    @property
+    def edge_count(self) -> int:
+        """
+        :return: The number of edges of the graph
+        """
+        return sum(1 for _ in self.edges())
+
+    def neighbours_of(self, v: int):
+        """
+        Returns the neighbours of vertex `v`
+        :param v: The vertex
+        :return: A slice of the neighbour array
+        """
+        return self._neighbours[self._offsets[v]:self._offsets[v + 1]]
+
+    def degree(self, v: int) -> int:
+        """
+        Returns the degree of vertex `v`
+        :param v: The vertex
+        """
+        return self._offsets[v + 1] - self._offsets[v]
+
+    def degrees(self):
+        """
+        :return: A list with the degree of every vertex
+        """
+        offsets = self._offsets
+        return [offsets[v + 1] - offsets[v] for v in range(self._n)]
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """
+        Iterates over the edges of the graph, each edge once as a (tail, head) pair with tail <= head.
+        For a multi-edge the pair is repeated.
+        """
+        offsets, neighbours = self._offsets, self._neighbours
+        for u in range(self._n):
+            for i in range(offsets[u], offsets[u + 1]):
+                if u <= neighbours[i]:
+                    yield u, neighbours[i]
+
+    def disjoint_union(self, other: "CSRGraph") -> "CSRGraph":
+        """
+        Makes the disjoint union of two graphs. The vertices of `other` are shifted by `len(self)`.
+        :param other: Graph to add to `self'
+        :return: New graph which is a disjoint union of `self' and `other'
+        """
+        n, m = self._n, len(self._neighbours)
+        offsets = array(TYPECODE, self._offsets[:n]) + array(TYPECODE, (o + m for o in other._offsets))
+        neighbours = array(TYPECODE, self._neighbours) + array(TYPECODE, (w + n for w in other._neighbours))
+        return CSRGraph(n + other._n, offsets, neighbours)
@@ -0,0 +1,138 @@
+"""
+Binary cache of the graphs in a .gr or .grl file, in CSR form (see csr_graph.py).
+The cache is written next to the source file, as `<file>.grcache` (for a member of a zip archive
+`<archive>.zip_<member>.grcache`), and is keyed by the SHA-256 hash
+of the contents of the source file, so it is rebuilt as soon as the source changes. The arrays are
+read back through `mmap` and used in place, without copying or parsing.
+
+Layout, all integers in the native byte order of 4-byte ints:
+    the magic bytes, the 32-byte hash of the source file,
+    the number of graphs k, then n and the length of the neighbour array of every graph (2k ints),
+    then for every graph its offset array (n + 1 ints) followed by its neighbour array.
+"""
+from array import array
+import hashlib
+import mmap
+import os
+
+from csr_graph import CSRGraph, TYPECODE
+from graph_io import iter_graphs, open_graph_file, ARCHIVE_SEPARATOR
+
+MAGIC = b'GRCACHE1'
+SUFFIX = '.grcache'
+ITEMSIZE = array(TYPECODE).itemsize
+
+
+def cache_path(path: str) -> str:
+    """
+    :param path: The path of the source file
+    :return: The path of its cache
+    """
+    return path.replace(ARCHIVE_SEPARATOR, '_') + SUFFIX
+
+
+def file_digest(path: str) -> bytes:
+    """
+    Computes the SHA-256 hash of the contents of a file
+    :param path: The path of the file, which may point into a zip archive (see graph_io.open_graph_file)
+    :return: The hash
+    """
+    digest = hashlib.sha256()
+    with open_graph_file(path, binary=True) as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def write_cache(path: str, graphs, digest: bytes):
+    """
+    Writes the cache of a source file
+    :param path: The path of the cache
+    :param graphs: List of graphs in CSR form
+    :param digest: The hash of the source file
+    """
+    sizes = array(TYPECODE, [len(graphs)])
+    for graph in graphs:
+        sizes.extend((len(graph), len(graph.neighbours)))
+    # Write to a temporary file first, so that a concurrent reader never sees half a cache
+    temporary = path + '.' + str(os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC)
+        f.write(digest)
+        sizes.tofile(f)
+        for graph in graphs:
+            array(TYPECODE, graph.offsets).tofile(f)
+            array(TYPECODE, graph.neighbours).tofile(f)
+    os.replace(temporary, path)
+
+
+def is_valid(n: int, offsets, neighbours) -> bool:
+    """
+    Checks that the arrays of a graph read from a cache form a graph: the offsets start at 0, never
+    decrease and end at the length of the neighbour array, and every neighbour is a vertex
+    :param n: The number of vertices
+    :param offsets: The offset array, of length n + 1
+    :param neighbours: The neighbour array
+    """
+    if offsets[0] != 0 or offsets[n] != len(neighbours):
+        return False
+    if any(offsets[v] > offsets[v + 1] for v in range(n)):
+        return False
+    return len(neighbours) == 0 or (min(neighbours) >= 0 and max(neighbours) < n)
+
+
+def read_cache(path: str, digest: bytes):
+    """
+    Reads the cache of a source file. The graphs refer directly to the memory-mapped file.
+    :param path: The path of the cache
+    :param digest: The hash of the source file
+    :return: List of graphs in CSR form, or None if there is no valid cache for this source
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    header = len(MAGIC) + len(digest)
+    if len(data) < header + ITEMSIZE or data[:len(MAGIC)] != MAGIC or data[len(MAGIC):header] != digest:
+        return None
+    # A truncated or corrupt cache must not be used: check the sizes against the length of the file
+    if (len(data) - header) % ITEMSIZE != 0:
+        return None
+    ints = memoryview(data)[header:].cast(TYPECODE)
+    count = ints[0]
+    if count < 0 or 1 + 2 * count > len(ints):
+        return None
+    sizes = ints[1:1 + 2 * count]
+    if min(sizes, default=0) < 0 or 1 + 2 * count + count + sum(sizes) != len(ints):
+        return None
+    position = 1 + 2 * count
+    graphs = []
+    for i in range(count):
+        n, length = sizes[2 * i], sizes[2 * i + 1]
+        offsets = ints[position:position + n + 1]
+        neighbours = ints[position + n + 1:position + n + 1 + length]
+        if not is_valid(n, offsets, neighbours):
+            return None
+        position += n + 1 + length
+        graphs.append(CSRGraph(n, offsets, neighbours))
+    return graphs
+
+
+def load_graphs(path: str):
+    """
+    Loads the graphs of a .gr or .grl file in CSR form, from the cache when it is up to date.
+    Otherwise the file is parsed and the cache is (re)written; a cache that cannot be written is skipped.
+    :param path: The path of the file, which may point into a zip archive (see graph_io.open_graph_file)
+    :return: List of graphs in CSR form
+    """
+    digest = file_digest(path)
+    graphs = read_cache(cache_path(path), digest)
+    if graphs is None:
+        with open_graph_file(path) as f:
+            graphs = list(iter_graphs(f, CSRGraph))
+        try:
+            write_cache(cache_path(path), graphs, digest)
+        except OSError:
+            pass
+    return graphs
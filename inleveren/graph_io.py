@@ -9,13 +9,22 @@ Includes functions for reading and writing graphs, in a very simple readable for
 # updated 5-2-2015: no black fill color used, when more than numcolors**2 vertices.
 # updated 29-1-2017: pep8 reformat, general improvements
 
+import io
+import os
 import sys
-from typing import IO, Tuple, List, Union
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
+from typing import IO, Tuple, List, Union, Iterator
 
 from graph import Graph, Edge
 
 DEFAULT_COLOR_SCHEME = "paired12"
 NUM_COLORS = 12
+ARCHIVE_SEPARATOR = ':'
+PASSWORD_VARIABLE = 'GRAPH_ARCHIVE_PASSWORD'  # Environment variable with the password of encrypted archives
+GRAPH_EXTENSIONS = ('.gr', '.grl')
+EDGE_LIST_VERTICES = '# Number of vertices:'  # Comment line of an edge list that gives the number of vertices
 
 
 def read_line(f: IO[str]) -> str:
@@ -39,13 +48,22 @@ def read_graph(graphclass, f: IO[str]) -> Tuple[Graph, List[str], bool]:
     :param f: The file
     :return: The graph
     """
+    n, edges, options, cont = read_graph_data(f)
+    return build_graph(graphclass, n, edges), options, cont
+
+
+def read_graph_data(f: IO[str]) -> Tuple[int, List[Tuple[int, int, int]], List[str], bool]:
+    """
+    Read the number of vertices and the edges of a graph from a file, without building the graph
+    :param f: The file
+    :return: Tuple (number of vertices, list of (tail, head, weight) tuples, options, whether another graph follows)
+    """
     options = []
 
     while True:
         try:
             line = read_line(f)
             n = int(line)
-            graph = graphclass(directed=False, n=n)
             break
         except ValueError:
             if len(line) > 0 and line[-1] == '\n':
@@ -68,15 +86,29 @@ def read_graph(graphclass, f: IO[str]) -> Tuple[Graph, List[str], bool]:
     except Exception:
         pass
 
+    return n, edges, options, line != '' and line[0] == '-'
+
+
+def build_graph(graphclass, n: int, edges: List[Tuple[int, int, int]]) -> Graph:
+    """
+    Build a graph from its number of vertices and its edge list
+    :param graphclass: The class of the graph. Classes with a `from_edges(n, edges)` constructor, such as
+    `csr_graph.CSRGraph`, are built directly from the edge list without creating `Vertex` and `Edge` objects.
+    :param n: The number of vertices
+    :param edges: List of (tail, head, weight) tuples with vertex numbers
+    :return: The graph
+    """
+    if hasattr(graphclass, 'from_edges'):
+        return graphclass.from_edges(n, edges)
+
+    graph = graphclass(directed=False, n=n)
     indexed_nodes = list(graph.vertices)
+    edge_class = getattr(graph, 'edge_class', Edge)
 
     for edge in edges:
-        graph += Edge(indexed_nodes[edge[0]], indexed_nodes[edge[1]], edge[2])
+        graph += edge_class(indexed_nodes[edge[0]], indexed_nodes[edge[1]], edge[2])
 
-    if line != '' and line[0] == '-':
-        return graph, options, True
-    else:
-        return graph, options, False
+    return graph
 
 
 def read_graph_list(graph_class, f: IO[str]) -> Tuple[List[Graph], List[str]]:
@@ -98,6 +130,69 @@ def read_graph_list(graph_class, f: IO[str]) -> Tuple[List[Graph], List[str]]:
     return graphs, options
 
 
+class GraphHandle(object):
+    """
+    A graph that has been read, but is only built when it is used for the first time.
+    Until then only its number of vertices and its edge list are kept.
+    """
+
+    def __init__(self, graph_class, n: int, edges: List[Tuple[int, int, int]], options: List[str]):
+        """
+        Creates a handle for a graph that has been read
+        :param graph_class: The class of the graph
+        :param n: The number of vertices
+        :param edges: List of (tail, head, weight) tuples with vertex numbers
+        :param options: The options read before the graph
+        """
+        self.graph_class = graph_class
+        self.options = options
+        self._n = n
+        self._edges = edges
+        self._graph = None
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the handle.
+        :return: The string to approximate the constructor arguments of the `GraphHandle'
+        """
+        return 'GraphHandle(#vertices={}, built={})'.format(self._n, self._graph is not None)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of vertices of the graph, without building it
+        """
+        return self._n
+
+    @property
+    def graph(self):
+        """
+        Builds the graph on first use; the edge list is released afterwards.
+        :return: The graph
+        """
+        if self._graph is None:
+            self._graph = build_graph(self.graph_class, self._n, self._edges)
+            self._edges = None
+        return self._graph
+
+
+def iter_graphs(f: IO[str], graph_class=Graph, lazy: bool = False) -> Iterator[Union[Graph, GraphHandle]]:
+    """
+    Read the graphs from a .gr or .grl file one by one. The next graph is only parsed when it is asked
+    for, so at most one graph is in memory at a time unless the caller keeps them.
+    :param f: The file
+    :param graph_class: The class of the graphs
+    :param lazy: Whether to yield a `GraphHandle` for every graph instead of the graph
+    :return: Iterator of graphs or handles
+    """
+    cont = True
+    while cont:
+        n, edges, options, cont = read_graph_data(f)
+        if lazy:
+            yield GraphHandle(graph_class, n, edges, options)
+        else:
+            yield build_graph(graph_class, n, edges)
+
+
 def load_graph(f: IO[str], graph_class=Graph, read_list: bool = False) -> Union[Tuple[List[Graph], List[str]], Graph]:
     """
     Load a graph from a file
@@ -114,6 +209,136 @@ def load_graph(f: IO[str], graph_class=Graph, read_list: bool = False) -> Union[
         return graph  # ,options
 
 
+def split_archive_path(path: str) -> Tuple[str, List[str]]:
+    """
+    Splits a path of the form `archive.zip[:member[:member...]]` into the file and the members,
+    where every member but the last is itself a zip archive
+    :param path: The path
+    :return: Tuple (file, list of members); the list is empty for ordinary files
+    """
+    parts = path.split(ARCHIVE_SEPARATOR)
+    for i in range(len(parts)):
+        if parts[i].endswith('.zip'):
+            return ARCHIVE_SEPARATOR.join(parts[:i + 1]), parts[i + 1:]
+    return path, []
+
+
+def graph_members(archive: zipfile.ZipFile) -> List[str]:
+    """
+    Returns the names of the graph files and the nested archives in a zip archive
+    :param archive: The archive
+    :return: List of member names
+    """
+    return [name for name in archive.namelist()
+            if name.endswith(GRAPH_EXTENSIONS + ('.zip',)) and not name.startswith('__MACOSX')]
+
+
+def open_member(stack: ExitStack, path: str, password: str = None) -> Tuple[IO[bytes], str]:
+    """
+    Opens a file or a member of a (nested) zip archive for reading, without extracting it. When the
+    member of an archive is not given, the archive has to contain exactly one graph file.
+    :param stack: The `ExitStack` that closes the files
+    :param path: The path, see split_archive_path
+    :param password: The password of encrypted archives; by default the value of the environment
+    variable GRAPH_ARCHIVE_PASSWORD
+    :return: Tuple (binary stream, path with all members filled in)
+    """
+    file, members = split_archive_path(path)
+    if not file.endswith('.zip'):
+        return stack.enter_context(open(file, 'rb')), path
+    if password is None:
+        password = os.environ.get(PASSWORD_VARIABLE)
+    pwd = password.encode() if password is not None else None
+    archive = stack.enter_context(zipfile.ZipFile(file))
+    resolved = [file]
+    while True:
+        if members:
+            name = members.pop(0)
+        else:
+            names = [name for name in graph_members(archive) if name.endswith(GRAPH_EXTENSIONS)]
+            if len(names) != 1:
+                raise ValueError(ARCHIVE_SEPARATOR.join(resolved) + ' contains ' + str(len(names)) +
+                                 ' graph files, choose one of: ' + ', '.join(names))
+            name = names[0]
+        resolved.append(name)
+        stream = stack.enter_context(archive.open(name, pwd=pwd))
+        if not name.endswith('.zip'):
+            return stream, ARCHIVE_SEPARATOR.join(resolved)
+        archive = stack.enter_context(zipfile.ZipFile(stream))
+
+
+@contextmanager
+def open_graph_file(path: str, binary: bool = False, password: str = None):
+    """
+    Opens a graph file for reading. The path may point into a zip archive, as `archive.zip[:member]`
+    (see split_archive_path); the member is then read from the archive without extracting it.
+    :param path: The path
+    :param binary: Whether to open the file as bytes instead of text
+    :param password: The password of encrypted archives (see open_member)
+    :return: Context manager that gives the file
+    """
+    with ExitStack() as stack:
+        stream, resolved = open_member(stack, path, password)
+        yield stream if binary else io.TextIOWrapper(stream)
+
+
+def resolve_graph_path(path: str, password: str = None) -> str:
+    """
+    Fills in the member of a path into a zip archive that contains exactly one graph file,
+    for example `Competition/c1.zip` becomes `Competition/c1.zip:comp1.gr`
+    :param path: The path
+    :param password: The password of encrypted archives (see open_member)
+    :return: The path with all members
+    """
+    with ExitStack() as stack:
+        return open_member(stack, path, password)[1]
+
+
+def list_graph_files(path: str) -> List[str]:
+    """
+    Lists the graph files in a zip archive, including those in nested archives
+    :param path: The path of the archive (or of an ordinary graph file)
+    :return: List of paths that can be opened with open_graph_file
+    """
+    file, members = split_archive_path(path)
+    if not file.endswith('.zip') or (members and not members[-1].endswith('.zip')):
+        return [path]
+    result = []
+    with ExitStack() as stack:
+        archive = stack.enter_context(zipfile.ZipFile(file))
+        for name in members:
+            archive = stack.enter_context(zipfile.ZipFile(stack.enter_context(archive.open(name))))
+        for name in graph_members(archive):
+            result += list_graph_files(path + ARCHIVE_SEPARATOR + name)
+    return result
+
+
+def load_graph_file(path: str, graph_class=Graph, password: str = None) -> Tuple[List[Graph], List[str]]:
+    """
+    Load the list of graphs from a .gr or .grl file, which may be in a zip archive (see open_graph_file)
+    :param path: The path
+    :param graph_class: The class of the graphs
+    :param password: The password of encrypted archives (see open_member)
+    :return: Tuple (list of graphs, options)
+    """
+    with open_graph_file(path, password=password) as f:
+        return load_graph(f, graph_class, read_list=True)
+
+
+def load_graph_files(paths: List[str], graph_class=Graph, workers: int = None,
+                     password: str = None) -> List[Tuple[List[Graph], List[str]]]:
+    """
+    Load several graph files or archive members concurrently, in a pool of threads
+    :param paths: The paths (see open_graph_file)
+    :param graph_class: The class of the graphs
+    :param workers: The number of threads; by default chosen by `ThreadPoolExecutor`
+    :param password: The password of encrypted archives (see open_member)
+    :return: List with the (list of graphs, options) tuple of every path, in the order of the paths
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda path: load_graph_file(path, graph_class, password), paths))
+
+
 def input_graph(graph_class=Graph, read_list: bool = False) -> Union[Tuple[List[Graph], List[str]], Graph]:
     """
     Load a graph from sys.stdin
@@ -244,6 +469,246 @@ def write_dot(graph: Graph, f: IO[str], directed=False):
 
     f.write('}')
 
+
+GRAPH6_HEADER = '>>graph6<<'
+SPARSE6_HEADER = '>>sparse6<<'
+
+
+def graph_edges(graph) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Returns the number of vertices and the edges of a graph, with the vertices numbered from 0
+    :param graph: The graph, a `Graph` or a graph in CSR form (see csr_graph.py)
+    :return: Tuple (number of vertices, list of (tail, head) tuples)
+    """
+    if hasattr(graph, 'offsets'):
+        return len(graph), list(graph.edges())
+    label = {}
+    for vertex_index, vertex in enumerate(graph.vertices):
+        label[vertex] = vertex_index
+    return len(label), [(label[e.tail], label[e.head]) for e in graph.edges]
+
+
+def encode_size(n: int) -> str:
+    """
+    Encodes the number of vertices for graph6 and sparse6
+    :param n: The number of vertices
+    :return: The encoding N(n)
+    """
+    if n < 63:
+        return chr(n + 63)
+    if n < 1 << 18:
+        return '~' + ''.join(chr(((n >> shift) & 63) + 63) for shift in (12, 6, 0))
+    return '~~' + ''.join(chr(((n >> shift) & 63) + 63) for shift in (30, 24, 18, 12, 6, 0))
+
+
+def decode_size(data: bytes) -> Tuple[int, bytes]:
+    """
+    Decodes the number of vertices of a graph6 or sparse6 string
+    :param data: The string without header and prefix, as bytes with 63 subtracted
+    :return: Tuple (number of vertices, rest of the data)
+    """
+    if data[0] != 63:
+        return data[0], data[1:]
+    if data[1] != 63:
+        size, length = 3, 1
+    else:
+        size, length = 6, 2
+    n = 0
+    for d in data[length:length + size]:
+        n = (n << 6) | d
+    return n, data[length + size:]
+
+
+def read_graph6(line: str, graph_class=Graph):
+    """
+    Read a graph from a line in graph6 format
+    :param line: The line
+    :param graph_class: The class of the graph
+    :return: The graph
+    """
+    if line.startswith(GRAPH6_HEADER):
+        line = line[len(GRAPH6_HEADER):]
+    n, data = decode_size(bytes(c - 63 for c in line.strip().encode()))
+    # Bit p of the data is the pair (i, j) with p = j * (j - 1) / 2 + i and i < j
+    edges = []
+    j, start = 1, 0
+    for index, d in enumerate(data):
+        for bit in range(6):
+            if d & (32 >> bit):
+                p = 6 * index + bit
+                while p >= start + j:
+                    start += j
+                    j += 1
+                if j < n:
+                    edges.append((p - start, j, None))
+    return build_graph(graph_class, n, edges)
+
+
+def read_sparse6(line: str, graph_class=Graph):
+    """
+    Read a graph from a line in sparse6 format. Loops and multi-edges are allowed.
+    :param line: The line
+    :param graph_class: The class of the graph
+    :return: The graph
+    """
+    if line.startswith(SPARSE6_HEADER):
+        line = line[len(SPARSE6_HEADER):]
+    n, data = decode_size(bytes(c - 63 for c in line.strip()[1:].encode()))
+    k = max(1, (n - 1).bit_length())
+    # The data is a sequence of (b, x) pairs: a bit b and a k-bit number x
+    bits = []
+    for d in data:
+        bits += [(d >> shift) & 1 for shift in range(5, -1, -1)]
+    edges = []
+    v = 0
+    position = 0
+    while position + 1 + k <= len(bits):
+        b = bits[position]
+        x = 0
+        for bit in bits[position + 1:position + 1 + k]:
+            x = (x << 1) | bit
+        position += 1 + k
+        if b == 1:
+            v += 1
+        if x >= n or v >= n:
+            break
+        elif x > v:
+            v = x
+        else:
+            edges.append((x, v, None))
+    return build_graph(graph_class, n, edges)
+
+
+def load_graph6(f: IO[str], graph_class=Graph) -> List[Graph]:
+    """
+    Load the graphs from a file in graph6 or sparse6 format, one graph per line
+    :param f: The file
+    :param graph_class: The class of the graphs
+    :return: The list of graphs
+    """
+    graphs = []
+    for line in f:
+        line = line.strip()
+        if line.startswith(SPARSE6_HEADER) or line.startswith(':'):
+            graphs.append(read_sparse6(line, graph_class))
+        elif line:
+            graphs.append(read_graph6(line, graph_class))
+    return graphs
+
+
+def load_edge_list(f: IO[str], graph_class=Graph, n: int = None):
+    """
+    Load a graph from a plain edge list: one edge per line, given by two vertex numbers separated by
+    whitespace and optionally followed by a weight. Empty lines and lines starting with '#' are skipped,
+    except for a line '# Number of vertices: n' as written by write_edge_list.
+    :param f: The file
+    :param graph_class: The class of the graph
+    :param n: The number of vertices; by default the one in the file, or else one more than the largest
+    vertex number
+    :return: The graph
+    """
+    edges = []
+    for line in f:
+        fields = line.split()
+        if line.startswith(EDGE_LIST_VERTICES) and n is None:
+            n = int(line[len(EDGE_LIST_VERTICES):])
+        if len(fields) < 2 or fields[0][0] == '#':
+            continue
+        edges.append((int(fields[0]), int(fields[1]), int(fields[2]) if len(fields) > 2 else None))
+    if n is None:
+        n = max((max(edge[0], edge[1]) for edge in edges), default=-1) + 1
+    return build_graph(graph_class, n, edges)
+
+
+def graph6_string(graph) -> str:
+    """
+    Encodes a graph in graph6 format. graph6 only describes simple graphs: loops are left out and
+    multi-edges are written once.
+    :param graph: The graph, a `Graph` or a graph in CSR form
+    :return: The string, without header and newline
+    """
+    n, edges = graph_edges(graph)
+    data = bytearray((n * (n - 1) // 2 + 5) // 6)
+    for u, v in edges:
+        if u != v:
+            i, j = min(u, v), max(u, v)
+            p = j * (j - 1) // 2 + i
+            data[p // 6] |= 32 >> (p % 6)
+    return encode_size(n) + bytes(d + 63 for d in data).decode()
+
+
+def sparse6_string(graph) -> str:
+    """
+    Encodes a graph in sparse6 format
+    :param graph: The graph, a `Graph` or a graph in CSR form
+    :return: The string, without header and newline
+    """
+    n, edges = graph_edges(graph)
+    k = max(1, (n - 1).bit_length())
+    bits = []
+
+    def encode(x):
+        bits.extend((x >> shift) & 1 for shift in range(k - 1, -1, -1))
+
+    v = 0
+    for head, tail in sorted((max(u, w), min(u, w)) for u, w in edges):
+        if head == v:
+            bits.append(0)
+        elif head == v + 1:
+            v += 1
+            bits.append(1)
+        else:
+            v = head
+            bits.append(1)
+            encode(head)
+            bits.append(0)
+        encode(tail)
+    # Padding that could be read as an extra edge to vertex n - 1 is prevented with a 0 bit
+    if k < 6 and n == (1 << k) and (-len(bits)) % 6 >= k and v < n - 1:
+        bits.append(0)
+    bits.extend([1] * ((-len(bits)) % 6))
+    data = bytes(sum(bit << (5 - i) for i, bit in enumerate(bits[start:start + 6])) + 63
+                 for start in range(0, len(bits), 6))
+    return ':' + encode_size(n) + data.decode()
+
+
+def write_graph6(graph_list, f: IO[str], sparse: bool = False, header: bool = False):
+    """
+    Write a graph, or a list of graphs, to a file in graph6 or sparse6 format, one graph per line
+    :param graph_list: The graph, or a list of graphs.
+    :param f: The file
+    :param sparse: Whether to use sparse6, which also supports loops and multi-edges
+    :param header: Whether to write the >>graph6<< or >>sparse6<< header
+    """
+    if type(graph_list) is not list:
+        graph_list = [graph_list]
+    for i, g in enumerate(graph_list):
+        prefix = (SPARSE6_HEADER if sparse else GRAPH6_HEADER) if header and i == 0 else ''
+        write_line(f, prefix + (sparse6_string(g) if sparse else graph6_string(g)))
+
+
+def write_edge_list(graph, f: IO[str]):
+    """
+    Write a graph to a file as a plain edge list, see load_edge_list. The first line gives the number of
+    vertices, so that isolated vertices are kept. The weights of the edges of a `Graph` are written like
+    write_graph does; graphs in CSR form have no weights.
+    :param graph: The graph, a `Graph` or a graph in CSR form
+    :param f: The file
+    """
+    if hasattr(graph, 'offsets'):
+        n, edges = len(graph), [(u, v, None) for u, v in graph.edges()]
+    else:
+        label = {}
+        for vertex_index, vertex in enumerate(graph.vertices):
+            label[vertex] = vertex_index
+        n, edges = len(label), [(label[e.tail], label[e.head], e.weight) for e in graph.edges]
+    write_line(f, EDGE_LIST_VERTICES + ' ' + str(n))
+    for u, v, weight in edges:
+        if weight:
+            write_line(f, str(u) + ' ' + str(v) + ' ' + str(weight))
+        else:
+            write_line(f, str(u) + ' ' + str(v))
+
 if __name__ == "__main__":
     from mygraphs import MyGraph
     with open('examplegraph.gr') as f:
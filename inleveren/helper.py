@@ -13,26 +13,15 @@ def add_vertex_to_partitions(partitions, key, value):
 
 def get_neighbourhood(v):  
     """
-    Get a sorted list of all the colors of all the neighbours
+    Get a sorted tuple of all the colors of all the neighbours, usable as dictionary key
     :param v: The vertex
-    :return: The sorted list
+    :return: The sorted tuple
     """
     result = []
     for n in v.neighbours:
         result.append(n.colornum)
     result.sort()
-    return result
-
-
-def get_copied_vertex(original, copy, vertex):
-    """
-    Get a sorted list of all the colors of all the neighbours
-    :param original: The original graph
-    :param copy: Copy of the graph
-    :return: The sorted list
-    """
-    index = original.vertices.index(vertex)
-    return copy.vertices[index]
+    return tuple(result)
 
 
 def get_last_color(partitions):
@@ -56,9 +45,9 @@ def get_partitions(G, H):
     """
     result = dict()
     # graph G
-    for vG in G.vertices:
+    for vG in G.vertex_view:
         add_vertex_to_partitions(result, vG.colornum, vG)
     # graph H
-    for vH in H.vertices:
+    for vH in H.vertex_view:
         add_vertex_to_partitions(result, vH.colornum, vH)
     return result
@@ -1,6 +1,16 @@
 from graph_io import load_graph, write_dot
+from csr_graph import CSRGraph
 import sys
+from collections import deque
 import helper
+import refinement
+from permutation_group import PermutationGroup, get_orbit
+from canonical import canonical_form
+from invariants import fingerprint, stable_coloring
+from parallel import parallel_map, open_pool
+from result_cache import graph_key, cached_map, COLORING, CERTIFICATE, AUTOMORPHISMS
+from trees import is_forest, forest_certificate, count_forest_automorphisms
+from modules import module_certificate, count_module_automorphisms
 
 # Magic numbers
 NO = 0
@@ -14,54 +24,120 @@ VERTICES = 1
 
 # Global variables
 count_isomorphism = True
+processes = 1  # Number of worker processes for find_all_isomorphisms and find_automorphisms
+result_cache = None  # The result_cache.ResultCache consulted before searching, if any
+worker_partition = None  # The partition of a worker process of search_automorphisms
 
 def find_all_isomorphisms(G_list):
     """
-    Refine and verify all graphs in a list from the .grl file
-    :param G_list: The list of graphs
+    Find the isomorphic pairs among all graphs in a list from the .grl file. Graphs are first
+    grouped by their fingerprint (see invariants.py); only graphs that share their fingerprint
+    with another graph are canonised. Graphs are isomorphic iff their canonical forms are equal.
+    Forests are canonised in linear time instead (see trees.py), and graphs with nontrivial modules
+    from their modular decomposition (see get_certificate).
+    With `processes` > 1, the graphs are sent to a pool of worker processes in CSR form.
+    Stable colorings and certificates of graphs other than forests are taken from `result_cache` when possible.
+    :param G_list: The list of graphs, as `graph.Graph` or in CSR form; the graphs may also be given by an
+    iterator (see graph_io.iter_graphs), so that only their CSR forms are kept
+    :return: List of equivalence classes (lists of indices)
     """
-    global count_isomorphism
-    count_isomorphism = False
-    for i in range(0, len(G_list[0])):
-        for j in range(i + 1, len(G_list[0])):
-            G = G_list[0][i]
-            H = G_list[0][j]
-            initial_coloring(G)
-            initial_coloring(H)
-            isomorphisms = find_isomorphisms(G, H)
-            if isomorphisms == 1:
+    graphs = [G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G) for G in G_list[0]]
+    keys = [graph_key(graph) for graph in graphs] if result_cache is not None else None
+    colorings = cached_map(stable_coloring, graphs, COLORING, result_cache, keys, processes)
+    fingerprints = parallel_map(get_fingerprint, list(zip(graphs, colorings)), processes)
+    bucket_sizes = dict()
+    for key in fingerprints:
+        bucket_sizes[key] = bucket_sizes.get(key, 0) + 1
+    todo = [i for i in range(0, len(graphs)) if bucket_sizes[fingerprints[i]] > 1]
+    certificates = {i: forest_certificate(graphs[i]) for i in todo if is_forest(graphs[i])}
+    todo = [i for i in todo if i not in certificates]
+    certificates.update(zip(todo, cached_map(get_certificate, [graphs[i] for i in todo], CERTIFICATE, result_cache,
+                                             [keys[i] for i in todo] if keys is not None else None, processes)))
+    classes = dict()
+    class_of = []
+    for i in range(0, len(graphs)):
+        key = fingerprints[i]
+        if i in certificates:
+            key = (key, certificates[i])
+        if key not in classes:
+            classes[key] = []
+        classes[key].append(i)
+        class_of.append(classes[key])
+    for i in range(0, len(graphs)):
+        for j in range(i + 1, len(graphs)):
+            if class_of[i] is class_of[j]:
                 print("["+str(i)+", "+str(j)+"] ")
+    return list(classes.values())
+
+
+def get_certificate(graph):
+    """
+    Computes a certificate of a graph: two graphs are isomorphic iff their certificates are equal.
+    It is the certificate of the modular decomposition (see modules.py) when the graph has nontrivial
+    modules, and the canonical form otherwise; the two cannot be equal.
+    :param graph: The graph in CSR form
+    :return: The certificate
+    """
+    certificate = module_certificate(graph)
+    return certificate if certificate is not None else canonical_form(graph)
+
+
+def get_fingerprint(item):
+    """
+    Computes the fingerprint of a graph from its stable coloring, see invariants.fingerprint
+    :param item: Tuple (graph in CSR form, coarsest stable coloring)
+    :return: The fingerprint
+    """
+    return fingerprint(*item)
 
 
 def count_all_automorphisms(G_list):
     """
-    Count all the automorphisms of the graphs in the graph list
+    Count all the automorphisms of the graphs in the graph list. When the graphs are given by an iterator
+    (see graph_io.iter_graphs), every count is printed before the next graph is read.
     :param G_list: The list of graphs
+    :return: List with the number of automorphisms of every graph
     """
-    for i in range(0, len(G_list[0])):
-        count_automorphisms(G_list[0][i], i)
+    return [count_automorphisms(G, i) for i, G in enumerate(G_list[0])]
 
 
 def count_automorphisms(G, name):
     """
-    Count the number of automorphisms of a graph
-    :param G: The graph G
+    Count the number of automorphisms of a graph, as the order of the group generated by the
+    automorphisms found by the search. Forests are counted in linear time (see trees.py). Other counts
+    are taken from `result_cache` when possible, and graphs with nontrivial modules are counted from
+    their modular decomposition (see modules.py).
+    :param G: The graph G, as `graph.Graph` or in CSR form
     :param name: The name of the graph
+    :return: The number of automorphisms
     """
-    initial_coloring(G)
-    isomorphisms = find_isomorphisms(G, G.deepcopy())
+    if not isinstance(G, CSRGraph):
+        initial_coloring(G)
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    if is_forest(graph):
+        isomorphisms = count_forest_automorphisms(graph)
+    else:
+        key = graph_key(graph) if result_cache is not None else None
+        isomorphisms = result_cache.get(key, AUTOMORPHISMS) if key is not None else None
+        if isomorphisms is None:
+            isomorphisms = count_module_automorphisms(graph)
+            if isomorphisms is None:
+                isomorphisms = find_automorphisms(G).order()
+            if key is not None:
+                result_cache.put(key, AUTOMORPHISMS, isomorphisms)
     print(str(name) + ":\t" + str(isomorphisms))
+    return isomorphisms
 
 
-def get_biggest_colorclass(partitions):
+def get_biggest_colorclass(partition):
     """
-    Returns the biggest color class in the given 'partitions' dictionary
-    :param partitions: The dictionary
+    Returns the biggest color class in the given partition
+    :param partition: The partition (see refinement.Partition)
     :return: The biggest color class
     """
     size = 0
     biggest = None
-    for p in partitions.values():
+    for color, p in partition.cells():
         if size < len(p) >= 4:
             size = len(p)
             biggest = p
@@ -73,23 +149,10 @@ def initial_coloring(G):
     Calculates the initial coloring based on the degrees of the vertices on a graph
     :param G: The graph
     """
-    for v in G.vertices:
+    for v in G.vertex_view:
         v.colornum = v.degree
 
 
-def get_color_of_neighbourhood(n, lst):
-    """
-    Get the color for which the same colored neighbourhood is already in the list
-    :param n: List of neighbour colors
-    :param lst: The 'update-list' with the following tuples: (color, vertex, neighbourhood)
-    :return: the found color or -1
-    """
-    for i in range(len(lst)):
-        if lst[i][NEIGHBOURS] == n:
-            return lst[i][COLOR]
-    return UNKNOWN
-
-
 def coarsest_stable_coloring(G, H):
     """
     Calculates the coarsest stable coloring on graphs G and H
@@ -99,78 +162,44 @@ def coarsest_stable_coloring(G, H):
     With int -> 0: unbalanced, 1: bijection, 2: stable but no bijection
     and dict: resulting partitions dictionary
     """
-
-    # Retrieve the partitions of the graphs
-    partitions = helper.get_partitions(G, H)
-    # Last key is the latest color class that is check whether it has
-    # an even or and odd number of vertices in it (odd number means unbalanced)
-    last_key = None
-    last_color = helper.get_last_color(partitions)
-    # Number of loops equals number of vertices
-    for v in range(len(G.vertices)):
-        for p in list(partitions.keys()):
-            color_class = partitions[p]
-            update_list = []  # list of (color, vertex, neighbourhood)-tuples
-            n_u = helper.get_neighbourhood(color_class[0])
-            for i in range(1, len(color_class)):
-                n_v = helper.get_neighbourhood(color_class[i])
-                if not n_u == n_v:
-                    color = get_color_of_neighbourhood(n_v, update_list)
-                    if color != UNKNOWN:
-                        update_list.append((color, color_class[i], n_v))
-                    else:
-                        update_list.append((last_color, color_class[i], n_v))
-                        last_color += 1
-            # Update the dictionary and the vertices
-            for t in update_list:
-                color_class.remove(t[VERTEX])
-                if t[COLOR] in partitions:
-                    partitions[t[COLOR]].append(t[VERTEX])
-                else:
-                    partitions[t[COLOR]] = [t[VERTEX]]
-                t[VERTEX].colornum = t[COLOR]
-            if len(color_class) % 2 != 0: # Check for unbalanced coloring
-                return (NO, partitions) 
-            last_key = p
-        if len(partitions) == len(G.vertices): # Check for bijection
-            return (YES, partitions)
-    # Check the resulting color classes for an unbalanced coloring
-    for p in range(last_key + 1, len(partitions)):
-        if p in partitions and len(partitions[p]) % 2 != 0:
-            return (NO, partitions)
-    return (MAYBE, partitions)
+    vertices = G.vertex_view + H.vertex_view
+    graph = CSRGraph.from_graph(G).disjoint_union(CSRGraph.from_graph(H))
+    partition = refinement.new_partition(graph, [v.colornum for v in vertices], len(G))
+    result = partition.refine()
+    # Copy the resulting colors back to the vertices
+    partitions = dict()
+    for v, color in zip(vertices, partition.colors()):
+        v.colornum = color
+        helper.add_vertex_to_partitions(partitions, color, v)
+    return (result, partitions)
 
 
 def find_isomorphisms(G, H):
     """
     Wrapper function to call the recursive count_isomorphisms(). Checks precondition.
+    The colors of the vertices are used as initial coloring.
     :param G: The graph G
     :param H: The graph H
     :return: The number of isomorphisms
     """
-    if not (len(G.vertices) == len(H.vertices)):
+    if not (len(G) == len(H)):
         return NO
-    return count_isomorphisms(G, H, [], [])
+    graph = CSRGraph.from_graph(G).disjoint_union(CSRGraph.from_graph(H))
+    colors = [v.colornum for v in G.vertex_view + H.vertex_view]
+    partition = refinement.new_partition(graph, colors, len(G))
+    return count_isomorphisms(partition, partition.refine())
 
 
-def count_isomorphisms(G, H, D, I):
+def count_isomorphisms(partition, result):
     """
-    Count the number of isomorphisms with graph G and H
-    :param G: The graph G
-    :param H: The graph H
+    Count the number of isomorphisms with graph G and H. All branches share one partition of
+    the disjoint union of G and H: each branch individualises a pair of vertices and undoes
+    its refinement steps before the next branch is tried.
+    :param partition: The stable partition of the disjoint union of G and H
+    :param result: The result of refining the partition
     :return: The number of isomorphisms
     """
     global count_isomorphism
-    color = helper.get_last_color(helper.get_partitions(G, H)) + 1
-
-    for vertex in D+I:
-        vertex.colornum = color
-
-    (result, partitions) = coarsest_stable_coloring(G, H)
-
-    for p in partitions:
-        if len(partitions[p]) % 2 != 0:
-            return NO
 
     # Coarsest stable coloring is unbalanced or a bijection
     if result == NO:
@@ -180,25 +209,174 @@ def count_isomorphisms(G, H, D, I):
     # Coarsest stable coloring is stable but not a bijection
     else:
         # Choose a color class C
-        C = get_biggest_colorclass(helper.get_partitions(G, H))
+        C = get_biggest_colorclass(partition)
         # Choose x in C union V(G)
-        x = None
-        for vertex in C:
-            if vertex.graph == G:
-                x = vertex
-                break
-        if x is None: # C has an even sized partitions, but all vertices are in H
-            return NO
+        x = min(C)
         num = 0
         # For all y in C union V(H)
         for y in C:
-            if y.graph == H:
-                # num = num + count_isomorphisms(G + x, H + x)
-                copy_g = G.deepcopy()
-                copy_h = H.deepcopy()
-                copy_x = helper.get_copied_vertex(G, copy_g, x)
-                copy_y = helper.get_copied_vertex(H, copy_h, y)
-                num = num + count_isomorphisms(copy_g, copy_h, [copy_x], [copy_y])
+            if y >= partition.left:
+                # num = num + count_isomorphisms(G + x, H + y)
+                mark = partition.mark()
+                num = num + count_isomorphisms(partition, partition.individualise(x, y))
+                partition.undo(mark)
                 if not(count_isomorphism) and num > 0:
                     return 1
         return num
+
+
+def init_search_worker(graph, colors, left):
+    """
+    Prepares a worker process of search_automorphisms
+    :param graph: The disjoint union of G and H in CSR form
+    :param colors: The initial coloring
+    :param left: The number of vertices of G
+    """
+    global worker_partition
+    worker_partition = refinement.new_partition(graph, colors, left)
+    worker_partition.refine()
+
+
+def find_in_subtree(path):
+    """
+    Searches one isomorphism in one subtree, in a worker process of search_automorphisms
+    :param path: List of the (x, y)-pairs individualised at the root of the subtree
+    :return: The isomorphism (see get_isomorphism()) or None if there is none
+    """
+    mark = worker_partition.mark()
+    for x, y in path:
+        result = worker_partition.individualise(x, y)
+    isomorphism = find_isomorphism(worker_partition, result)
+    worker_partition.undo(mark)
+    return isomorphism
+
+
+def get_isomorphism(partition):
+    """
+    Reads the isomorphism from a partition of the disjoint union of G and H that is a bijection
+    :param partition: The partition
+    :return: List that maps every vertex of G to a vertex of H (numbered from 0)
+    """
+    mapping = [UNKNOWN] * partition.left
+    for color, p in partition.cells():
+        mapping[min(p)] = max(p) - partition.left
+    return mapping
+
+
+def find_isomorphism(partition, result):
+    """
+    Searches for one isomorphism, sharing the partition of the disjoint union of G and H
+    like count_isomorphisms()
+    :param partition: The stable partition of the disjoint union of G and H
+    :param result: The result of refining the partition
+    :return: The isomorphism (see get_isomorphism()) or None if there is none
+    """
+    if result == NO:
+        return None
+    elif result == YES:
+        return get_isomorphism(partition)
+    else:
+        C = get_biggest_colorclass(partition)
+        x = min(C)
+        for y in C:
+            if y >= partition.left:
+                mark = partition.mark()
+                isomorphism = find_isomorphism(partition, partition.individualise(x, y))
+                partition.undo(mark)
+                if isomorphism is not None:
+                    return isomorphism
+        return None
+
+
+def find_automorphisms(G, colors=None):
+    """
+    Computes the automorphism group of a graph, using the colors of the vertices as initial coloring.
+    A graph in CSR form has no colors; its vertices are colored by their degrees, unless `colors` is given.
+    With `processes` > 1, the branches off the identity path of the search are searched by worker processes.
+    :param G: The graph G, as `graph.Graph` or in CSR form
+    :param colors: Optional initial coloring of a graph in CSR form
+    :return: The automorphism group (see permutation_group.PermutationGroup)
+    """
+    if isinstance(G, CSRGraph):
+        graph = G
+        colors = refinement.initial_coloring(graph) if colors is None else list(colors)
+    else:
+        graph = CSRGraph.from_graph(G)
+        colors = [v.colornum for v in G.vertex_view]
+    union = graph.disjoint_union(graph)
+    partition = refinement.new_partition(union, colors + colors, len(colors))
+    generators = []
+    base = []
+    result = partition.refine()
+    if processes > 1 and result == MAYBE:
+        pool = open_pool(processes, init_search_worker, (union, colors + colors, len(colors)))
+        try:
+            search_automorphisms(partition, result, generators, base, pool)
+        finally:
+            # Let the searches that are no longer needed finish: terminating workers that hold a lock
+            # of the task queue can deadlock the pool
+            pool.close()
+            pool.join()
+    else:
+        search_automorphisms(partition, result, generators, base)
+    return PermutationGroup(len(colors), generators, base, strong=True)
+
+
+def search_automorphisms(partition, result, generators, base, pool=None):
+    """
+    Searches generators of the automorphism group of G, on the partition of the disjoint union of
+    G and a copy of G. Only the branch in which x is mapped to its own copy (the identity path) is
+    searched completely. For every other y only one automorphism mapping x to y is searched, and only
+    if y is not yet in the orbit of x under the automorphisms found so far. The automorphisms found
+    below a node on the identity path then generate the stabiliser of the vertices individualised
+    before it, so the vertices individualised on the identity path form a base.
+    With a `pool`, the searches for the y of every node on the identity path are done by the workers,
+    with up to `processes` searches running at a time. Their automorphisms are merged in the order of y,
+    skipping the y that came into the orbit meanwhile, so the generators are the same as those of the
+    serial search.
+    :param partition: The stable partition of the disjoint union of G and its copy
+    :param result: The result of refining the partition
+    :param generators: List to which the automorphisms found are added
+    :param base: List to which the vertices individualised on the identity path are added
+    :param pool: Optional pool of worker processes, prepared by init_search_worker
+    """
+    if result == MAYBE:
+        n = partition.left
+        C = get_biggest_colorclass(partition)
+        x = min(C)
+        # The identity path down to this node
+        path = [(b, b + n) for b in base]
+        base.append(x)
+        first = len(generators)
+        # The identity path: map x to its own copy
+        mark = partition.mark()
+        search_automorphisms(partition, partition.individualise(x, x + n), generators, base, pool)
+        partition.undo(mark)
+        # All automorphisms found below this node fix the vertices individualised so far
+        orbit = get_orbit(generators[first:], x)
+        not_in_orbit = set()
+        candidates = deque(y for y in sorted(C) if y >= n)
+        running = deque()
+        while candidates or running:
+            # Keep up to `processes` searches running, in the order of y
+            while candidates and len(running) < (processes if pool is not None else 1):
+                y = candidates.popleft()
+                if y - n not in orbit and y - n not in not_in_orbit:
+                    task = pool.apply_async(find_in_subtree, (path + [(x, y)],)) if pool is not None else None
+                    running.append((y, task))
+            if not running:
+                break
+            y, task = running.popleft()
+            if y - n in orbit or y - n in not_in_orbit:
+                continue
+            if task is not None:
+                automorphism = task.get()
+            else:
+                mark = partition.mark()
+                automorphism = find_isomorphism(partition, partition.individualise(x, y))
+                partition.undo(mark)
+            if automorphism is not None:
+                generators.append(automorphism)
+                orbit = get_orbit(generators[first:], x)
+            else:
+                not_in_orbit |= get_orbit(generators[first:], y - n)
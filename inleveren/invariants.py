@@ -0,0 +1,71 @@
+"""
+Cheap isomorphism invariants of graphs. Isomorphic graphs always have equal fingerprints, so
+graphs with different fingerprints can be rejected without searching for an isomorphism.
+"""
+from csr_graph import CSRGraph
+import refinement
+
+
+def degree_sequence(graph):
+    """
+    Returns the sorted degree sequence of a graph
+    :param graph: The graph in CSR form
+    :return: Tuple of degrees
+    """
+    return tuple(sorted(graph.degrees()))
+
+
+def stable_coloring(graph):
+    """
+    Returns the coarsest stable coloring of a graph, starting from the degrees
+    :param graph: The graph in CSR form
+    :return: List with the color of every vertex
+    """
+    return refinement.coarsest_stable_coloring(graph, refinement.initial_coloring(graph))[1]
+
+
+def color_histogram(graph, colors=None):
+    """
+    Returns the sizes of the color classes of the coarsest stable coloring, starting from the degrees.
+    Cells are numbered invariantly by the refinement, so the sizes are listed in the order of the cells.
+    :param graph: The graph in CSR form
+    :param colors: The coarsest stable coloring, when it is already known (see stable_coloring)
+    :return: Tuple of (size, degree)-tuples, one for every color class
+    """
+    if colors is None:
+        colors = stable_coloring(graph)
+    sizes = dict()
+    representative = dict()
+    for v, color in enumerate(colors):
+        sizes[color] = sizes.get(color, 0) + 1
+        representative.setdefault(color, v)
+    return tuple((sizes[color], graph.degree(representative[color])) for color in sorted(sizes))
+
+
+def triangle_count(graph):
+    """
+    Counts the triangles of a graph; loops and multi-edges are ignored
+    :param graph: The graph in CSR form
+    :return: The number of triangles
+    """
+    adjacent = [set(graph.neighbours_of(v)) for v in range(len(graph))]
+    count = 0
+    for u in range(len(graph)):
+        for v in adjacent[u]:
+            if u < v:
+                count += sum(1 for w in adjacent[u] & adjacent[v] if v < w)
+    return count
+
+
+def fingerprint(G, colors=None):
+    """
+    Computes the fingerprint of a graph, ordered from cheap to expensive invariants: the number of
+    vertices and edges, the degree sequence, the stable color histogram and the number of triangles.
+    Compute it once per graph and compare the results.
+    :param G: The graph (`graph.Graph` or `csr_graph.CSRGraph`)
+    :param colors: The coarsest stable coloring, when it is already known (see stable_coloring)
+    :return: The fingerprint, a hashable tuple
+    """
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    return (len(graph), graph.edge_count, degree_sequence(graph), color_histogram(graph, colors),
+            triangle_count(graph))
@@ -1,42 +1,76 @@
 import sys
-from graph_io import load_graph, write_dot
+from graph_io import load_graph, write_dot, open_graph_file, resolve_graph_path, iter_graphs
+from csr_graph import CSRGraph
+import ind_refinement
+import refinement
 from ind_refinement import find_all_isomorphisms, count_all_automorphisms, count_automorphisms
+from parallel import default_processes
+from graph_cache import load_graphs
+from result_cache import ResultCache
 
 if __name__ == "__main__":
     """
     Main function
-    :param 1: A .grl or .gr file for computing the isomorphism or automorphism problem
+    :param 1: A .grl or .gr file for computing the isomorphism or automorphism problem, which may be in a
+    zip archive: archive.zip[:member] (set GRAPH_ARCHIVE_PASSWORD for encrypted archives)
     :param 2: (Only with .grl files) -a for computing automorphisms and -i for computing isomorphisms
+    :param 3: (Optional) -j followed by the number of worker processes, or -j alone for one per processor
+    :param 4: (Optional) -c to read the graphs from a binary cache next to the file (see graph_cache.py)
+    :param 5: (Optional) -r to reuse and store results in a persistent cache (see result_cache.py)
+    :param 6: (Optional) -b to refine dense graphs with bitsets (see bitset_graph.py)
     """
-    USAGE = "Usage: python3 " + sys.argv[0] + " [filename] <options>"
+    USAGE = "Usage: python3 " + sys.argv[0] + " [filename|archive.zip[:member]] <options> [-j [processes]] [-c] [-r] [-b]"
     OPTIONS = "options:\t-i or isomorphism\n\t\t-a or automorphisms"
     if len(sys.argv) < 2:
         print(USAGE)
         exit(-1)
-    if (sys.argv[1].endswith(".grl")):
+    if "-j" in sys.argv:
+        index = sys.argv.index("-j")
+        if index + 1 < len(sys.argv) and sys.argv[index + 1].isdigit():
+            ind_refinement.processes = int(sys.argv.pop(index + 1))
+        else:
+            ind_refinement.processes = default_processes()
+        sys.argv.pop(index)
+    cache = "-c" in sys.argv
+    if cache:
+        sys.argv.remove("-c")
+    if "-r" in sys.argv:
+        sys.argv.remove("-r")
+        ind_refinement.result_cache = ResultCache()
+    if "-b" in sys.argv:
+        sys.argv.remove("-b")
+        refinement.bitsets = True
+    try:
+        path = resolve_graph_path(sys.argv[1])
+    except (OSError, ValueError, RuntimeError) as error:
+        print(error)
+        exit(-1)
+    if (path.endswith(".grl")):
         # Graph list
         if sys.argv[2] == "-i" or sys.argv[2] == "isomorphism":
             # Find isomorphisms
-            with open(sys.argv[1]) as f:
-                graph_list = load_graph(f, read_list = True)
+            with open_graph_file(path) as f:
+                graph_list = (load_graphs(path) if cache else iter_graphs(f, CSRGraph), [])
                 print("Sets of isomorphic graphs:")
                 find_all_isomorphisms(graph_list)
         elif sys.argv[2] == "-a" or sys.argv[2] == "automorphism":
             # Count automorphisms
-            with open(sys.argv[1]) as f:
-                graph_list = load_graph(f, read_list = True)
+            with open_graph_file(path) as f:
+                graph_list = (load_graphs(path) if cache else iter_graphs(f, CSRGraph), [])
                 print("Graph:\tNumber of automorphisms:")
                 count_all_automorphisms(graph_list)
         else:
             print(USAGE)
             print(OPTIONS)
             exit(-1)
-    elif (sys.argv[1].endswith(".gr")):
+    elif (path.endswith(".gr")):
         # Single graph
-        with open(sys.argv[1]) as f:
-            graph = load_graph(f)
+        with open_graph_file(path) as f:
+            graph = load_graphs(path)[0] if cache else load_graph(f, CSRGraph)
             print("Graph:\tNumber of automorphisms:")
             count_automorphisms(graph, 0)
     else:
         print(USAGE)
         exit(-1)
+    if ind_refinement.result_cache is not None:
+        ind_refinement.result_cache.close()
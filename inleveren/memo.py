@@ -0,0 +1,71 @@
+"""
+Bounded in-process memo of results, for searches that reach the same state more than once.
+When the memo is full, the least recently used entry is removed.
+"""
+from collections import OrderedDict
+
+
+class LRUMemo(object):
+    """
+    Least recently used cache of key -> value with at most `size` entries.
+    The number of hits and misses of `get` are counted, to tune the size.
+    """
+
+    def __init__(self, size: int):
+        """
+        Creates an empty memo
+        :param size: The maximal number of entries; 0 disables the memo
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the memo.
+        :return: The string to approximate the constructor arguments of the `LRUMemo'
+        """
+        return 'LRUMemo(size={}, entries={}, hits={}, misses={})'.format(
+            self.size, len(self._entries), self.hits, self.misses)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of entries
+        """
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Looks up a value and marks it as recently used
+        :param key: The key
+        :param default: The value to return when the key is not in the memo
+        :return: The value
+        """
+        if key not in self._entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        """
+        Stores a value, removing the least recently used entry when the memo is full
+        :param key: The key
+        :param value: The value
+        """
+        if self.size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all entries and resets the counters
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
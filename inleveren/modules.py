@@ -0,0 +1,262 @@
+"""
+Isomorphism and automorphisms of graphs with large modules, via their modular decomposition.
+A module is a set of vertices that all have the same neighbours outside the set. The strong modules
+(those that overlap no other module) form the decomposition tree: the children of a node are its
+maximal strong submodules, and the node is parallel (the subgraph is disconnected), series (the
+complement is disconnected) or prime (the quotient graph on the children has no nontrivial modules).
+Cographs are exactly the graphs without prime nodes; their decomposition tree is the cotree.
+
+Certificates and automorphism counts are combined bottom-up: the children of a parallel or series
+node are only sorted, and isomorphic children may be permuted freely, which contributes m! for every
+group of m isomorphic children. Only the quotient graphs of prime nodes are searched, with the
+vertices colored by the isomorphism classes of the children.
+The sets of vertices are bitsets, see bitset_graph.py.
+"""
+from math import factorial
+
+from bitset_graph import BitsetGraph, is_simple, iter_bits, vertex_mask
+from canonical import canonical_form
+from csr_graph import CSRGraph
+
+# Kinds of the nodes of the decomposition tree
+LEAF = 0  # A single vertex
+PARALLEL = 1  # The children are the components
+SERIES = 2  # The children are the components of the complement
+PRIME = 3  # The children are the maximal strong modules, and the quotient graph is prime
+
+
+def components(rows, mask: int, complement: bool = False):
+    """
+    Returns the connected components of the subgraph induced by a set of vertices
+    :param rows: List with the neighbourhood bitset of every vertex
+    :param mask: The bitset of the vertices
+    :param complement: Whether to use the complement of the subgraph instead
+    :return: List of bitsets
+    """
+    result = []
+    rest = mask
+    while rest:
+        component = frontier = rest & -rest
+        while frontier:
+            reached = 0
+            for v in iter_bits(frontier):
+                reached |= ~rows[v] if complement else rows[v]
+            frontier = reached & rest & ~component
+            component |= frontier
+        rest &= ~component
+        result.append(component)
+    return result
+
+
+def module_closure(rows, mask: int, module: int, stop: int = 0) -> int:
+    """
+    Returns the smallest module of the subgraph induced by `mask` that contains a set of vertices, by
+    adding vertices that are adjacent to some but not all of the set until there are none. The vertices
+    adjacent to some and those non-adjacent to some vertex of the set are kept up to date, so that every
+    vertex is only looked at when it is added.
+    :param rows: List with the neighbourhood bitset of every vertex
+    :param mask: The bitset of the vertices of the subgraph
+    :param module: The bitset of the set
+    :param stop: Bitset of vertices; the search stops as soon as one of them is added
+    :return: The bitset of the module, or of the vertices added so far when it meets `stop`
+    """
+    adjacent = non_adjacent = 0
+    new = module
+    while new and not module & stop:
+        for v in iter_bits(new):
+            adjacent |= rows[v]
+            non_adjacent |= ~rows[v]
+        new = adjacent & non_adjacent & mask & ~module
+        module |= new
+    return module
+
+
+def maximal_modules_without(rows, mask: int, v: int):
+    """
+    Returns the maximal modules of the subgraph induced by `mask` that do not contain vertex `v`, by
+    splitting the other vertices on their adjacency to every vertex outside their part
+    :param rows: List with the neighbourhood bitset of every vertex
+    :param mask: The bitset of the vertices of the subgraph
+    :param v: The vertex
+    :return: List of bitsets, which partition the vertices other than `v`
+    """
+    parts = [mask & ~(1 << v)]
+    # Single vertices cannot be split any further
+    singletons = []
+    pivots = [v]
+    queued = 1 << v
+    while pivots and parts:
+        x = pivots.pop()
+        queued &= ~(1 << x)
+        unsplit = []
+        for part in parts:
+            inside = part & rows[x]
+            if not inside or inside == part or part >> x & 1:
+                unsplit.append(part)
+                continue
+            for half in (inside, part ^ inside):
+                (singletons if half & (half - 1) == 0 else unsplit).append(half)
+            # The vertices of both halves now have to split each other
+            new = part & ~queued
+            queued |= new
+            pivots.extend(iter_bits(new))
+        parts = unsplit
+    return parts + singletons
+
+
+def prime_children(rows, mask: int):
+    """
+    Returns the maximal strong modules of a subgraph whose quotient graph is prime. Every maximal module
+    without vertex v is one of them, or lies in the one that contains v. A vertex x lies in the latter iff
+    the smallest module containing x and v is not the whole subgraph, that is, iff it contains none of the
+    vertices found outside the latter so far.
+    :param rows: List with the neighbourhood bitset of every vertex
+    :param mask: The bitset of the vertices of the subgraph, which is connected, and so is its complement
+    :return: List of bitsets
+    """
+    v = (mask & -mask).bit_length() - 1
+    module = 1 << v
+    outside = 0
+    result = []
+    for part in maximal_modules_without(rows, mask, v):
+        closure = module_closure(rows, mask, module | part, outside)
+        if closure & outside or closure == mask:
+            result.append(part)
+            outside |= part
+        else:
+            module = closure
+    result.append(module)
+    return result
+
+
+def modular_decomposition(graph):
+    """
+    Computes the modular decomposition tree of a simple graph (see bitset_graph.is_simple)
+    :param graph: The graph in CSR form, with at least one vertex
+    :return: Tuple (kinds, children, masks) with the kind, the list of children and the bitset of the vertices
+    of every node. Node 0 is the root, and every node comes before its children.
+    """
+    rows = BitsetGraph.from_graph(graph).rows
+    kinds = []
+    children = []
+    masks = []
+    todo = [(vertex_mask(range(len(graph)), len(graph)), None)]
+    while todo:
+        mask, parent = todo.pop()
+        if parent is not None:
+            children[parent].append(len(kinds))
+        masks.append(mask)
+        children.append([])
+        if mask & (mask - 1) == 0:
+            kinds.append(LEAF)
+            continue
+        kind, parts = PARALLEL, components(rows, mask)
+        if len(parts) == 1:
+            kind, parts = SERIES, components(rows, mask, True)
+        if len(parts) == 1:
+            kind, parts = PRIME, prime_children(rows, mask)
+        todo += [(part, len(kinds)) for part in parts]
+        kinds.append(kind)
+    return kinds, children, masks
+
+
+def is_decomposable(kinds, children) -> bool:
+    """
+    Checks whether a modular decomposition has a module other than the single vertices and the whole graph
+    :param kinds: The kinds of the nodes (see modular_decomposition)
+    :param children: The children of the nodes
+    """
+    return kinds[0] != PRIME or any(kinds[c] != LEAF for c in children[0])
+
+
+def quotient_graph(rows, masks) -> CSRGraph:
+    """
+    Returns the quotient graph of a set of disjoint modules: module i and j are adjacent iff their vertices are
+    :param rows: List with the neighbourhood bitset of every vertex
+    :param masks: List with the bitset of every module
+    :return: The quotient graph in CSR form
+    """
+    representatives = [(mask & -mask).bit_length() - 1 for mask in masks]
+    return CSRGraph.from_edges(len(masks), [(i, j) for i in range(len(masks)) for j in range(i + 1, len(masks))
+                                            if rows[representatives[i]] >> representatives[j] & 1])
+
+
+def module_labels(graph, decomposition, count: bool = False):
+    """
+    Computes the certificates of the nodes of the modular decomposition of a graph, from the leaves up. The
+    certificate of a leaf tells whether the vertex has a loop. A parallel or series node has the sorted
+    certificates of its children, and a prime node the sorted distinct certificates of its children and the
+    canonical form of its quotient graph, colored by the ranks of the certificates of the children.
+    :param graph: The graph in CSR form
+    :param decomposition: Its modular decomposition (see modular_decomposition)
+    :param count: Whether to count the automorphisms of the nodes as well
+    :return: Tuple (certificates, counts) with the certificate of every node and the number of automorphisms
+    of the subgraph induced by every node (None if `count` is False)
+    """
+    # Imported here, since ind_refinement uses this module
+    from ind_refinement import find_automorphisms
+
+    rows = BitsetGraph.from_graph(graph).rows
+    kinds, children, masks = decomposition
+    certificates = [None] * len(kinds)
+    counts = [1] * len(kinds) if count else None
+    for node in reversed(range(len(kinds))):
+        if kinds[node] == LEAF:
+            v = masks[node].bit_length() - 1
+            certificates[node] = (LEAF, rows[v] >> v & 1)
+            continue
+        labels = [certificates[c] for c in children[node]]
+        if kinds[node] == PRIME:
+            distinct = sorted(set(labels))
+            rank = {label: i for i, label in enumerate(distinct)}
+            colors = [rank[label] for label in labels]
+            quotient = quotient_graph(rows, [masks[c] for c in children[node]])
+            certificates[node] = (PRIME, tuple(distinct), canonical_form(quotient, colors))
+            if count:
+                counts[node] = find_automorphisms(quotient, colors).order()
+        else:
+            certificates[node] = (kinds[node], tuple(sorted(labels)))
+            if count:
+                multiplicities = dict()
+                for label in labels:
+                    multiplicities[label] = multiplicities.get(label, 0) + 1
+                for m in multiplicities.values():
+                    counts[node] *= factorial(m)
+        if count:
+            for c in children[node]:
+                counts[node] *= counts[c]
+    return certificates, counts
+
+
+def module_certificate(G):
+    """
+    Computes a certificate of a graph from its modular decomposition: two graphs are isomorphic iff their
+    certificates are equal
+    :param G: The graph (`graph.Graph` or `csr_graph.CSRGraph`)
+    :return: The certificate, a hashable tuple, or None if the graph has multi-edges or no nontrivial modules
+    """
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    if len(graph) < 2 or not is_simple(graph):
+        return None
+    decomposition = modular_decomposition(graph)
+    if not is_decomposable(*decomposition[:2]):
+        return None
+    return module_labels(graph, decomposition)[0][0]
+
+
+def count_module_automorphisms(G):
+    """
+    Counts the automorphisms of a graph from its modular decomposition. Every automorphism permutes the
+    children of every node, and maps each child onto an isomorphic one, so the count is the product over all
+    nodes of the automorphisms of their quotient graphs that respect the isomorphism classes of the children
+    (m! for every group of m isomorphic children of a parallel or series node).
+    :param G: The graph (`graph.Graph` or `csr_graph.CSRGraph`)
+    :return: The number of automorphisms, or None if the graph has multi-edges or no nontrivial modules
+    """
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    if len(graph) < 2 or not is_simple(graph):
+        return None
+    decomposition = modular_decomposition(graph)
+    if not is_decomposable(*decomposition[:2]):
+        return None
+    return module_labels(graph, decomposition, True)[1][0]
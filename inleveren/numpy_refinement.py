@@ -0,0 +1,141 @@
+"""
+Color refinement with NumPy, as an alternative to refinement.py for large graphs.
+The coloring is an integer array and every round recolors all vertices at once: the
+neighbour colors are gathered over an edge index array and (vertex, color) pairs are counted
+and numbered by sorting, so no Python loop runs over the vertices or the edges.
+"""
+import numpy as np
+
+# Magic numbers
+NO = 0
+YES = 1
+MAYBE = 2
+
+
+def edge_arrays(graph):
+    """
+    Returns the edge index arrays of a graph: edge i goes from tails[i] to heads[i], and every
+    edge occurs in both directions (loops once)
+    :param graph: The graph in CSR form
+    :return: Tuple (tails, heads) of int64 arrays
+    """
+    offsets = np.frombuffer(graph.offsets, dtype=np.intc).astype(np.int64)
+    heads = np.frombuffer(graph.neighbours, dtype=np.intc).astype(np.int64)
+    tails = np.repeat(np.arange(len(graph), dtype=np.int64), np.diff(offsets))
+    return tails, heads
+
+
+def number_pairs(first, second):
+    """
+    Numbers the distinct (first[v], second[v]) pairs 0, 1, ... in sorted order
+    :param first: Array of non-negative ints
+    :param second: Array of ints >= -1
+    :return: Array with the number of the pair of every position
+    """
+    keys = first * (int(second.max()) + 2) + (second + 1)
+    return np.unique(keys, return_inverse=True)[1].reshape(-1)
+
+
+def refine_round(colors, tails, heads):
+    """
+    Performs one round of color refinement: vertices keep the same color iff they had the same
+    color and have the same multiset of neighbour colors. The new colors only depend on the old
+    colors, so the result is isomorphism invariant.
+    The multiset of a vertex is the sorted sequence of its (neighbour color, count) runs, and the
+    sequences are numbered with a constant number of vector operations (see number_sequences).
+    :param colors: Array with the color (0, ..., k - 1) of every vertex
+    :param tails: The tails of the edges
+    :param heads: The heads of the edges
+    :return: Array with the new colors
+    """
+    if len(tails) == 0:
+        return colors
+    neighbour_colors = colors[heads]
+    order = np.lexsort((neighbour_colors, tails))
+    tails, neighbour_colors = tails[order], neighbour_colors[order]
+    # Runs of equal (vertex, neighbour color) pairs, with their length
+    starts = np.flatnonzero(np.concatenate(([True], (tails[1:] != tails[:-1]) |
+                                            (neighbour_colors[1:] != neighbour_colors[:-1]))))
+    counts = np.diff(np.append(starts, len(tails)))
+    vertices, neighbour_colors = tails[starts], neighbour_colors[starts]
+    codes = neighbour_colors * (int(counts.max()) + 1) + counts
+    return number_pairs(colors, number_sequences(len(colors), vertices, codes))
+
+
+def number_sequences(n, vertices, codes):
+    """
+    Numbers the sequences of codes of the vertices, so that vertices get the same number iff their
+    sequences are equal. Usually the sequences are padded to the length d of the longest one and the
+    rows are numbered with one `np.unique` on their bytes. When the padded matrix would be much larger
+    than the runs, as for a vertex with many neighbour colors in a sparse graph, the sequences are
+    numbered by prefix doubling instead: after the step with length k, every run is numbered by the next
+    k runs of its vertex, starting with itself, which takes O(log d) vector operations.
+    :param n: The number of vertices
+    :param vertices: The vertex of every run, in increasing order
+    :param codes: The code of every run
+    :return: Array with the number of the sequence of every vertex
+    """
+    # The runs of every vertex start at first[i] and end at (not including) end[i]
+    first = np.flatnonzero(np.concatenate(([True], vertices[1:] != vertices[:-1])))
+    end = np.append(first[1:], len(vertices))
+    lengths = end - first
+    longest = int(lengths.max())
+    if n * longest <= 4 * len(codes) + n:
+        index = np.arange(len(codes)) - np.repeat(first, lengths)
+        rows = np.full((n, longest), -1, dtype=np.int64)
+        rows[vertices, index] = codes
+        return np.unique(rows.view(np.dtype((np.void, 8 * longest))).reshape(-1), return_inverse=True)[1].reshape(-1)
+    run_end = np.repeat(end, lengths)
+    numbers = np.unique(codes, return_inverse=True)[1].reshape(-1)
+    positions = np.arange(len(codes))
+    length = 1
+    while length < longest:
+        following = positions + length
+        numbers = number_pairs(numbers, np.where(following < run_end,
+                                                 numbers[np.minimum(following, len(codes) - 1)], -1))
+        length *= 2
+    result = np.full(n, -1, dtype=np.int64)
+    result[vertices[first]] = numbers[first]
+    return result
+
+
+def get_result(colors, left):
+    """
+    Checks the coloring of the disjoint union of G and H
+    :param colors: Array with the color (0, ..., k - 1) of every vertex
+    :param left: The number of vertices of G, or None when the graph is not a disjoint union
+    :return: NO if unbalanced, YES if a bijection and MAYBE otherwise
+    """
+    if left is None:
+        return MAYBE
+    k = int(colors.max()) + 1 if len(colors) else 0
+    if not np.array_equal(np.bincount(colors[:left], minlength=k), np.bincount(colors[left:], minlength=k)):
+        return NO
+    if 2 * k == len(colors):
+        return YES
+    return MAYBE
+
+
+def coarsest_stable_coloring(graph, colors, left=None):
+    """
+    Calculates the coarsest stable coloring of a graph in CSR form. Same interface as
+    `refinement.coarsest_stable_coloring`, but the colors are numbered differently.
+    :param graph: The graph, usually the disjoint union of G and H
+    :param colors: The initial coloring
+    :param left: The number of vertices of G, or None when the graph is not a disjoint union
+    :return: Tuple (int, list)
+    With int -> 0: unbalanced, 1: bijection, 2: stable but no bijection
+    and list: the resulting coloring
+    """
+    tails, heads = edge_arrays(graph)
+    colors = np.unique(np.asarray(colors), return_inverse=True)[1].reshape(-1).astype(np.int64)
+    count = len(np.unique(colors))
+    result = get_result(colors, left)
+    while result != NO:
+        colors = refine_round(colors, tails, heads)
+        new_count = int(colors.max()) + 1 if len(colors) else 0
+        if new_count == count:
+            break
+        count = new_count
+        result = get_result(colors, left)
+    return result, colors.tolist()
@@ -0,0 +1,47 @@
+"""
+Spreading independent tasks over a pool of worker processes. Tasks and results are pickled, so
+they should be compact: send graphs in CSR form (see csr_graph.py) rather than `graph.Graph` objects.
+"""
+from multiprocessing import Pool, cpu_count
+
+
+def default_processes() -> int:
+    """
+    :return: The number of processors of this machine
+    """
+    return cpu_count()
+
+
+def parallel_map(function, items, processes=1, initializer=None, initargs=()):
+    """
+    Applies `function` to all items, using `processes` worker processes. The results are returned
+    in the order of the items, independent of the order in which the workers finish.
+    :param function: Function of one argument, defined at module level so that it can be pickled
+    :param items: List of arguments
+    :param processes: The number of worker processes; with 1 (or at most one item) no pool is started
+    :param initializer: Optional function that every worker calls with `initargs` before its first
+    task, for example to receive data shared by all tasks once instead of with every task
+    :param initargs: The arguments of `initializer`
+    :return: List of results
+    """
+    items = list(items)
+    if processes <= 1 or len(items) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [function(item) for item in items]
+    processes = min(processes, len(items))
+    chunksize = max(1, len(items) // (4 * processes))
+    with Pool(processes, initializer, initargs) as pool:
+        return pool.map(function, items, chunksize)
+
+
+def open_pool(processes, initializer=None, initargs=()):
+    """
+    Starts a pool of worker processes for several rounds of tasks, for example with `pool.map`.
+    The caller has to close and join the pool when it is done.
+    :param processes: The number of worker processes
+    :param initializer: Optional function that every worker calls with `initargs` before its first task
+    :param initargs: The arguments of `initializer`
+    :return: The `multiprocessing.Pool`
+    """
+    return Pool(processes, initializer, initargs)
@@ -0,0 +1,234 @@
+"""
+Permutation groups given by generators, with a base and strong generating set computed by the
+Schreier-Sims algorithm. A permutation of {0, ..., n - 1} is an integer array p that maps v to p[v].
+"""
+from array import array
+
+# Type code of the permutation arrays
+TYPECODE = 'i'
+
+
+def identity(n):
+    """
+    Returns the identity permutation
+    :param n: The degree
+    :return: The permutation
+    """
+    return array(TYPECODE, range(n))
+
+
+def is_identity(p):
+    """
+    Returns True iff `p` is the identity permutation
+    :param p: The permutation
+    """
+    return all(p[v] == v for v in range(len(p)))
+
+
+def compose(p, q):
+    """
+    Returns the permutation that first applies `p` and then `q`
+    :param p: The first permutation
+    :param q: The second permutation
+    :return: The product
+    """
+    return array(TYPECODE, [q[v] for v in p])
+
+
+def inverse(p):
+    """
+    Returns the inverse of a permutation
+    :param p: The permutation
+    :return: The inverse
+    """
+    result = array(TYPECODE, p)
+    for v in range(len(p)):
+        result[p[v]] = v
+    return result
+
+
+def get_orbit(generators, x):
+    """
+    Computes the orbit of a vertex under the group generated by some automorphisms
+    :param generators: List of automorphisms
+    :param x: The vertex
+    :return: Set of vertices in the orbit of x
+    """
+    orbit = {x}
+    new = [x]
+    while new:
+        v = new.pop()
+        for g in generators:
+            if g[v] not in orbit:
+                orbit.add(g[v])
+                new.append(g[v])
+    return orbit
+
+
+class PermutationGroup(object):
+    """
+    A permutation group, stored as a stabiliser chain: for every base point b_i the group
+    G_i fixing b_0, ..., b_(i-1) pointwise, given by its strong generators, and the orbit of b_i
+    under G_i with a transversal (for every point x of the orbit a permutation mapping b_i to x).
+    The order of the group is the product of the orbit lengths.
+    """
+
+    def __init__(self, n, generators, base=(), strong=False):
+        """
+        Creates the group generated by `generators` and computes a base and strong generating set
+        :param n: The degree, that is, the number of points
+        :param generators: Iterable of permutations (lists or arrays)
+        :param base: Optional start of the base. A good base, such as the vertices individualised on
+        the first path of an automorphism search, keeps the strong generating set small.
+        :param strong: Whether `generators` is already known to be a strong generating set relative to
+        `base`, in which case only the transversals are computed and the Schreier-Sims test is skipped.
+        """
+        self._n = n
+        self.base = []
+        self.strong_generators = []
+        self._level_generators = []
+        self._transversals = []
+        self._inverse_transversals = []
+        self._checked = []
+        for b in base:
+            self._add_base_point(b)
+        for g in generators:
+            g = array(TYPECODE, g)
+            if strong:
+                self._add_generator(g, 0)
+            elif not is_identity(g) and not self.contains(g):
+                self._add_generator(g, 0)
+                self._schreier_sims()
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the group.
+        :return: The string to approximate the constructor arguments of the `PermutationGroup'
+        """
+        return 'PermutationGroup(n={}, #generators={}, order={})'.format(
+            self._n, len(self.strong_generators), self.order())
+
+    @property
+    def degree(self) -> int:
+        """
+        :return: The number of points the group acts on
+        """
+        return self._n
+
+    def order(self) -> int:
+        """
+        :return: The number of elements of the group
+        """
+        result = 1
+        for transversal in self._transversals:
+            result *= len(transversal)
+        return result
+
+    def orbit(self, x):
+        """
+        Returns the orbit of a point under the group
+        :param x: The point
+        :return: Set of points
+        """
+        return get_orbit(self.strong_generators, x)
+
+    def contains(self, p) -> bool:
+        """
+        Returns True iff permutation `p` is an element of the group
+        :param p: The permutation
+        """
+        residue, level = self._sift(array(TYPECODE, p), 0)
+        return level == len(self.base) and is_identity(residue)
+
+    def _sift(self, g, level):
+        """
+        For internal use only; divides g by transversal elements from `level` down the chain
+        :param g: A permutation fixing the base points before `level`
+        :param level: The level to start at
+        :return: Tuple (residue, level at which sifting stopped)
+        """
+        while level < len(self.base):
+            b = self.base[level]
+            x = g[b]
+            if x not in self._transversals[level]:
+                return g, level
+            if x != b:
+                g = compose(g, self._inverse_transversals[level][x])
+            level += 1
+        return g, level
+
+    def _add_generator(self, g, level):
+        """
+        For internal use only; adds a strong generator that fixes the base points before `level`,
+        extending the base when g fixes all base points
+        :param g: The generator
+        :param level: The first level whose group contains g
+        """
+        if all(g[b] == b for b in self.base):
+            self._add_base_point(next(v for v in range(self._n) if g[v] != v))
+        self.strong_generators.append(g)
+        for i in range(level, len(self.base)):
+            self._level_generators[i].append(g)
+            if g[self.base[i]] != self.base[i]:
+                break
+        for i in range(level, len(self.base)):
+            self._compute_orbit(i)
+
+    def _add_base_point(self, b):
+        """
+        For internal use only; appends a point to the base
+        :param b: The point
+        """
+        self.base.append(b)
+        self._level_generators.append([])
+        self._transversals.append({b: identity(self._n)})
+        self._inverse_transversals.append({b: identity(self._n)})
+        self._checked.append(set())
+
+    def _compute_orbit(self, level):
+        """
+        For internal use only; (re)computes the orbit and transversal of a base point
+        :param level: The level of the base point
+        """
+        transversal = self._transversals[level]
+        inverse_transversal = self._inverse_transversals[level]
+        new = list(transversal)
+        while new:
+            x = new.pop()
+            for g in self._level_generators[level]:
+                y = g[x]
+                if y not in transversal:
+                    transversal[y] = compose(transversal[x], g)
+                    inverse_transversal[y] = inverse(transversal[y])
+                    new.append(y)
+
+    def _schreier_sims(self):
+        """
+        For internal use only; completes the strong generating set. Every Schreier generator
+        u_x g u_(x^g)^-1 of every level must sift to the identity through the levels below.
+        Transversal elements never change once computed, so a Schreier generator that sifted to the
+        identity keeps doing so and is not checked again.
+        """
+        level = len(self.base) - 1
+        while level >= 0:
+            added = False
+            transversal = self._transversals[level]
+            inverse_transversal = self._inverse_transversals[level]
+            checked = self._checked[level]
+            for x in list(transversal):
+                for i, g in enumerate(list(self._level_generators[level])):
+                    if (x, i) in checked:
+                        continue
+                    h = compose(compose(transversal[x], g), inverse_transversal[g[x]])
+                    residue, stop = self._sift(h, level + 1)
+                    if stop == len(self.base) and is_identity(residue):
+                        checked.add((x, i))
+                    else:
+                        self._add_generator(residue, level + 1)
+                        level = len(self.base) - 1
+                        added = True
+                        break
+                if added:
+                    break
+            if not added:
+                level -= 1
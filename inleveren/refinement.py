@@ -0,0 +1,343 @@
+"""
+Color refinement on graphs in CSR form (see csr_graph.py).
+A coloring is a list with the color of every vertex. Isomorphism problems are solved on the
+disjoint union of G and H, where the vertices 0, ..., left - 1 belong to G and the others to H.
+"""
+
+from collections import deque
+
+from bitset_graph import BitsetGraph, vertex_mask, iter_bits, popcount, is_dense, is_simple
+
+# Magic numbers
+NO = 0
+YES = 1
+MAYBE = 2
+
+# Global variables
+bitsets = False  # Whether new_partition uses BitsetPartition for dense graphs
+
+
+def initial_coloring(graph):
+    """
+    Calculates the initial coloring based on the degrees of the vertices of a graph
+    :param graph: The graph in CSR form
+    :return: The coloring
+    """
+    return graph.degrees()
+
+
+class Partition(object):
+    """
+    Partition of the vertices of a graph into color classes (cells), refined with the
+    "process the smaller half" strategy of Hopcroft.
+
+    The vertices of every cell are stored consecutively in `elements`, and a cell is identified
+    by the position of its first vertex, which is also used as its color. Splitters wait in a
+    worklist; when a cell is split, only the new parts are added to the worklist and, when the
+    cell itself was already processed, the largest part is left out.
+    Splits and worklist order only depend on the colors and neighbour counts, never on the
+    numbering of the vertices, so the resulting coloring is isomorphism invariant.
+
+    Every split is recorded on a trail, so that a search can individualise vertices, refine, and
+    return to an earlier partition with `undo` instead of copying the graphs.
+    """
+
+    def __init__(self, graph, colors, left=None):
+        """
+        Creates the partition of `graph` in which vertices with the same color form a cell.
+        :param graph: The graph in CSR form, usually the disjoint union of G and H
+        :param colors: The initial coloring
+        :param left: The number of vertices of G, or None when the graph is not a disjoint union
+        """
+        n = len(graph)
+        self._offsets = graph.offsets
+        self._neighbours = graph.neighbours
+        self.left = left
+        self.elements = sorted(range(n), key=colors.__getitem__)
+        self.position = [0] * n
+        self.cell_of = [0] * n
+        self.cell_end = [0] * n
+        self.left_count = [0] * n
+        self.cell_count = 0
+        self.unbalanced = False
+        self.trail = []
+        self._worklist = deque()
+        self._in_worklist = [False] * n
+
+        start = 0
+        for i in range(n + 1):
+            if i > start and (i == n or colors[self.elements[i]] != colors[self.elements[start]]):
+                self._new_cell(start, i)
+                self._enqueue(start)
+                start = i
+            if i < n:
+                self.position[self.elements[i]] = i
+
+    def _new_cell(self, start, end):
+        """
+        For internal use only; registers the vertices on positions start, ..., end - 1 as one cell
+        :param start: The first position
+        :param end: The position after the last vertex
+        """
+        left_count = 0
+        for i in range(start, end):
+            v = self.elements[i]
+            self.cell_of[v] = start
+            if self.left is not None and v < self.left:
+                left_count += 1
+        self.cell_end[start] = end
+        self.left_count[start] = left_count
+        self.cell_count += 1
+        if self.left is not None and 2 * left_count != end - start:
+            self.unbalanced = True
+
+    def _enqueue(self, cell):
+        """
+        For internal use only; adds a cell to the worklist
+        :param cell: The cell
+        """
+        if not self._in_worklist[cell]:
+            self._in_worklist[cell] = True
+            self._worklist.append(cell)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of cells
+        """
+        return self.cell_count
+
+    def colors(self):
+        """
+        :return: List with the color (cell) of every vertex
+        """
+        return list(self.cell_of)
+
+    def cell(self, cell):
+        """
+        Returns the vertices of a cell
+        :param cell: The cell
+        :return: List of vertices
+        """
+        return self.elements[cell:self.cell_end[cell]]
+
+    def cells(self):
+        """
+        Iterates over the cells in order of their color
+        :return: Iterator of (color, list of vertices)-tuples
+        """
+        start = 0
+        while start < len(self.elements):
+            yield start, self.elements[start:self.cell_end[start]]
+            start = self.cell_end[start]
+
+    def first_nontrivial_cell(self):
+        """
+        Returns the first cell with more than one vertex. The partition must not be discrete.
+        :return: The cell
+        """
+        start = 0
+        while self.cell_end[start] - start == 1:
+            start = self.cell_end[start]
+        return start
+
+    def result(self):
+        """
+        Checks the (stable) partition of the disjoint union of G and H
+        :return: NO if unbalanced, YES if a bijection and MAYBE otherwise
+        """
+        if self.unbalanced:
+            return NO
+        if 2 * self.cell_count == len(self.elements):
+            return YES
+        return MAYBE
+
+    def mark(self):
+        """
+        Returns the current state of the trail, to be passed to `undo`
+        :return: The mark
+        """
+        return len(self.trail), self.unbalanced
+
+    def undo(self, mark):
+        """
+        Merges all cells split after `mark` was taken, restoring the partition of that moment
+        :param mark: The mark returned by `mark`
+        """
+        length, self.unbalanced = mark
+        while len(self.trail) > length:
+            cell, start = self.trail.pop()
+            end = self.cell_end[start]
+            for v in self.elements[start:end]:
+                self.cell_of[v] = cell
+            self.cell_end[cell] = end
+            self.left_count[cell] += self.left_count[start]
+            self.cell_count -= 1
+
+    def individualise(self, x, y=None):
+        """
+        Gives vertex `x`, and `y` when given, a new color of their own and refines the partition.
+        Both vertices must be in the same cell, which has to be stable and larger than the new cell.
+        :param x: The vertex (of G)
+        :param y: The optional vertex (of H) that `x` is mapped to
+        :return: NO if unbalanced, YES if a bijection and MAYBE otherwise
+        """
+        cell = self.cell_of[x]
+        end = self.cell_end[cell]
+        start = end
+        for v in (x, y):
+            if v is not None:
+                start -= 1
+                u = self.elements[start]
+                self.elements[self.position[v]], self.elements[start] = u, v
+                self.position[u], self.position[v] = self.position[v], start
+        self.cell_end[cell] = start
+        self._new_cell(start, end)
+        self.left_count[cell] -= self.left_count[start]
+        self.trail.append((cell, start))
+        self._enqueue(start)
+        return self.refine()
+
+    def refine(self):
+        """
+        Refines the partition until it is stable. Stops early when a cell becomes unbalanced.
+        :return: NO if unbalanced, YES if a bijection and MAYBE otherwise
+        """
+        cell_of = self.cell_of
+        while self._worklist and not self.unbalanced:
+            splitter = self._worklist.popleft()
+            self._in_worklist[splitter] = False
+            counts = self._count_neighbours(splitter)
+            touched = dict()
+            for w in counts:
+                cell = cell_of[w]
+                if cell in touched:
+                    touched[cell].append(w)
+                else:
+                    touched[cell] = [w]
+            for cell in sorted(touched):
+                self._split(cell, touched[cell], counts)
+                if self.unbalanced:
+                    break
+        while self._worklist:
+            self._in_worklist[self._worklist.pop()] = False
+        return self.result()
+
+    def _count_neighbours(self, splitter):
+        """
+        For internal use only; counts the neighbours in a cell of every vertex adjacent to it
+        :param splitter: The cell
+        :return: Dictionary with the number of neighbours in the cell of the vertices adjacent to it
+        """
+        offsets, neighbours = self._offsets, self._neighbours
+        counts = dict()
+        for v in self.elements[splitter:self.cell_end[splitter]]:
+            for i in range(offsets[v], offsets[v + 1]):
+                w = neighbours[i]
+                counts[w] = counts.get(w, 0) + 1
+        return counts
+
+    def _split(self, cell, touched, counts):
+        """
+        For internal use only; splits a cell by the number of neighbours in the current splitter
+        :param cell: The cell
+        :param touched: The vertices of the cell with at least one neighbour in the splitter
+        :param counts: Dictionary with the number of neighbours in the splitter of the touched vertices
+        """
+        end = self.cell_end[cell]
+        elements, position = self.elements, self.position
+        touched.sort(key=counts.__getitem__)
+        if len(touched) == end - cell and counts[touched[0]] == counts[touched[-1]]:
+            return
+        # Move the touched vertices to the end of the cell, sorted by their count
+        first = end - len(touched)
+        for i, w in enumerate(touched):
+            u = elements[first + i]
+            elements[position[w]], elements[first + i] = u, w
+            position[u], position[w] = position[w], first + i
+        # Boundaries of the parts; the first part keeps the id of the cell
+        bounds = [first] if first > cell else []
+        for i in range(1, len(touched)):
+            if counts[touched[i]] != counts[touched[i - 1]]:
+                bounds.append(first + i)
+        bounds.append(end)
+        self.cell_end[cell] = bounds[0]
+        parts = [cell]
+        for start, stop in zip(bounds, bounds[1:]):
+            self._new_cell(start, stop)
+            self.left_count[cell] -= self.left_count[start]
+            self.trail.append((parts[-1], start))
+            parts.append(start)
+        if self._in_worklist[cell]:
+            skip = cell
+        else:
+            skip = max(parts, key=lambda part: self.cell_end[part] - part)
+        for part in parts:
+            if part != skip:
+                self._enqueue(part)
+
+
+class BitsetPartition(Partition):
+    """
+    `Partition` that counts neighbours with the bitsets of the graph (see bitset_graph.py): the vertices
+    adjacent to a splitter are the union of the rows of its vertices, and the number of neighbours of
+    such a vertex is popcount(row & splitter). On dense graphs this replaces the loop over the edges
+    of the splitter by a few word-parallel operations per vertex. The graph must not have multi-edges.
+    The counts are the same as those of `Partition`, so both give the same colorings.
+    """
+
+    def __init__(self, graph, colors, left=None):
+        """
+        Creates the partition of `graph` in which vertices with the same color form a cell.
+        :param graph: The graph in CSR form, usually the disjoint union of G and H
+        :param colors: The initial coloring
+        :param left: The number of vertices of G, or None when the graph is not a disjoint union
+        """
+        super(BitsetPartition, self).__init__(graph, colors, left)
+        self._rows = BitsetGraph.from_graph(graph).rows
+
+    def _count_neighbours(self, splitter):
+        """
+        For internal use only; counts the neighbours in a cell of every vertex adjacent to it
+        :param splitter: The cell
+        :return: Dictionary with the number of neighbours in the cell of the vertices adjacent to it
+        """
+        rows = self._rows
+        vertices = self.elements[splitter:self.cell_end[splitter]]
+        adjacent = 0
+        for v in vertices:
+            adjacent |= rows[v]
+        # For small splitters, following their edges is cheaper than one popcount per adjacent vertex
+        offsets = self._offsets
+        if sum(offsets[v + 1] - offsets[v] for v in vertices) <= 2 * popcount(adjacent):
+            return super(BitsetPartition, self)._count_neighbours(splitter)
+        mask = vertex_mask(vertices, len(rows))
+        return {w: popcount(rows[w] & mask) for w in iter_bits(adjacent)}
+
+
+def new_partition(graph, colors, left=None):
+    """
+    Creates a `BitsetPartition` for dense graphs without multi-edges when `bitsets` is set,
+    and a `Partition` otherwise
+    :param graph: The graph in CSR form, usually the disjoint union of G and H
+    :param colors: The initial coloring
+    :param left: The number of vertices of G, or None when the graph is not a disjoint union
+    :return: The partition
+    """
+    if bitsets and is_dense(graph) and is_simple(graph):
+        return BitsetPartition(graph, colors, left)
+    return Partition(graph, colors, left)
+
+
+def coarsest_stable_coloring(graph, colors, left=None):
+    """
+    Calculates the coarsest stable coloring of a graph in CSR form
+    :param graph: The graph, usually the disjoint union of G and H
+    :param colors: The initial coloring
+    :param left: The number of vertices of G, or None when the graph is not a disjoint union
+    :return: Tuple (int, list)
+    With int -> 0: unbalanced, 1: bijection, 2: stable but no bijection
+    and list: the resulting coloring
+    """
+    partition = new_partition(graph, colors, left)
+    result = partition.refine()
+    return result, partition.colors()
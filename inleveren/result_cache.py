@@ -0,0 +1,191 @@
+"""
+On-disk cache of results that only depend on a graph: its coarsest stable coloring, its canonical
+form and the number of automorphisms. Entries are keyed by a hash of the CSR arrays of the graph
+(see csr_graph.py), so a graph is recognised in any file as long as its vertices are numbered the same.
+The cache is an SQLite database of bounded size; when it grows too large, the least recently used
+entries are removed. The database records the FORMAT_VERSION of its results, and is emptied when that
+differs, so results of older algorithms are never mixed with new ones.
+"""
+from array import array
+import ast
+import hashlib
+import os
+import sqlite3
+
+from csr_graph import CSRGraph, TYPECODE
+from parallel import parallel_map
+
+# Fields of an entry
+COLORING = 'coloring'
+CERTIFICATE = 'certificate'
+AUTOMORPHISMS = 'automorphisms'
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'graph_isomorphism', 'results.sqlite3')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Increase whenever the results change: the certificates (canonical.py, modules.py), the colors of the
+# stable colorings (refinement.py) or the way the values are stored
+FORMAT_VERSION = 3
+
+
+def graph_key(G) -> str:
+    """
+    Computes the structural hash of a graph
+    :param G: The graph (`graph.Graph` or `csr_graph.CSRGraph`)
+    :return: The hash, as a hexadecimal string
+    """
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    digest = hashlib.sha256()
+    digest.update(array(TYPECODE, graph.offsets).tobytes())
+    digest.update(array(TYPECODE, graph.neighbours).tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    """
+    Persistent least recently used cache of (graph hash, field) -> value.
+    The values are stored as Python literals, which are read back with `ast.literal_eval`, so a
+    tampered database cannot run code; their total size is kept below `max_bytes`.
+    Changes are committed by `put` and `close`, not by every lookup.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Opens the cache, creating the database when it does not exist
+        :param path: The path of the database
+        :param max_bytes: The maximal total size of the cached values
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+        row = self._connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != FORMAT_VERSION:
+            self._connection.execute('DROP TABLE IF EXISTS results')
+            self._connection.execute("DELETE FROM meta WHERE name = 'total'")
+            self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (FORMAT_VERSION,))
+        self._connection.execute('CREATE TABLE IF NOT EXISTS results (graph TEXT, field TEXT, value TEXT, '
+                                 'size INTEGER, used INTEGER, PRIMARY KEY (graph, field))')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        # The total size of the values is kept in the meta table, so that `put` does not have to add it up
+        self._connection.execute("INSERT OR IGNORE INTO meta SELECT 'total', COALESCE(SUM(size), 0) FROM results")
+        self._connection.commit()
+        self._clock = self._connection.execute('SELECT COALESCE(MAX(used), 0) FROM results').fetchone()[0]
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the cache.
+        :return: The string to approximate the constructor arguments of the `ResultCache'
+        """
+        return 'ResultCache(path={!r}, max_bytes={}, hits={}, misses={})'.format(
+            self.path, self.max_bytes, self.hits, self.misses)
+
+    def _tick(self) -> int:
+        """
+        For internal use only; advances the clock that orders the entries by their last use
+        :return: The new time
+        """
+        self._clock += 1
+        return self._clock
+
+    def get(self, key: str, field: str, default=None):
+        """
+        Looks up a value and marks it as recently used; the mark is committed with the next `put` or `close`
+        :param key: The hash of the graph (see graph_key)
+        :param field: The field, for example CERTIFICATE
+        :param default: The value to return when the entry is not in the cache
+        :return: The value
+        """
+        row = self._connection.execute('SELECT value FROM results WHERE graph = ? AND field = ?',
+                                       (key, field)).fetchone()
+        value = None
+        if row is not None:
+            try:
+                value = ast.literal_eval(row[0])
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                # A damaged entry counts as missing, and is replaced by the next `put`
+                pass
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._connection.execute('UPDATE results SET used = ? WHERE graph = ? AND field = ?',
+                                 (self._tick(), key, field))
+        return value
+
+    def put(self, key: str, field: str, value):
+        """
+        Stores a value, evicting the least recently used entries when the cache becomes too large
+        :param key: The hash of the graph (see graph_key)
+        :param field: The field, for example CERTIFICATE
+        :param value: The value: an int, or a list or tuple of ints, lists and tuples
+        """
+        data = repr(value)
+        row = self._connection.execute('SELECT size FROM results WHERE graph = ? AND field = ?',
+                                       (key, field)).fetchone()
+        self._connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                                 (key, field, data, len(data), self._tick()))
+        self._evict(self._add_to_total(len(data) - (row[0] if row is not None else 0)))
+        self._connection.commit()
+
+    def _add_to_total(self, size: int) -> int:
+        """
+        For internal use only; adds to the total size of the values in the meta table
+        :param size: The number of bytes to add, negative for removed values
+        :return: The new total
+        """
+        self._connection.execute("UPDATE meta SET value = value + ? WHERE name = 'total'", (size,))
+        return self._connection.execute("SELECT value FROM meta WHERE name = 'total'").fetchone()[0]
+
+    def _evict(self, total: int):
+        """
+        For internal use only; removes the least recently used entries until the cache fits in `max_bytes`.
+        Only the removed entries are visited, in the order of the index on their last use.
+        :param total: The total size of the values
+        """
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        removed = 0
+        for key, field, size in self._connection.execute('SELECT graph, field, size FROM results ORDER BY used'):
+            if total - removed <= self.max_bytes:
+                break
+            evicted.append((key, field))
+            removed += size
+        self._connection.executemany('DELETE FROM results WHERE graph = ? AND field = ?', evicted)
+        self._add_to_total(-removed)
+
+    def close(self):
+        """
+        Commits the marks of the recently used entries and closes the database
+        """
+        self._connection.commit()
+        self._connection.close()
+
+
+def cached_map(function, graphs, field, cache=None, keys=None, processes=1):
+    """
+    Applies a function to graphs like parallel.parallel_map, taking the results from a cache when possible.
+    Results that are not in the cache are computed and stored.
+    :param function: Function of one graph, defined at module level
+    :param graphs: List of graphs in CSR form
+    :param field: The field under which the results are cached
+    :param cache: The `ResultCache`, or None to compute all results
+    :param keys: The hashes of the graphs (see graph_key); computed when not given
+    :param processes: The number of worker processes
+    :return: List of results
+    """
+    if cache is None:
+        return parallel_map(function, graphs, processes)
+    if keys is None:
+        keys = [graph_key(graph) for graph in graphs]
+    results = [cache.get(key, field) for key in keys]
+    todo = [i for i in range(len(graphs)) if results[i] is None]
+    for i, result in zip(todo, parallel_map(function, [graphs[i] for i in todo], processes)):
+        cache.put(keys[i], field, result)
+        results[i] = result
+    return results
@@ -0,0 +1,162 @@
+"""
+Isomorphism and automorphisms of forests in linear time (up to sorting), with the algorithm of
+Aho, Hopcroft and Ullman (AHU). Every tree is rooted at its centre, or at a new vertex in the middle
+of its central edge when it has two centres, and all roots become children of one new root.
+Labels are then assigned level by level, from the deepest level up: vertices on the same level
+get the same label iff their subtrees are isomorphic.
+"""
+from math import factorial
+
+from csr_graph import CSRGraph
+
+# Kinds of the vertices of the rooted forest
+VERTEX = 0  # A vertex of the graph
+MIDDLE = 1  # The new root in the middle of the central edge of a tree with two centres
+ROOT = 2  # The root of the whole forest
+
+
+def is_forest(graph) -> bool:
+    """
+    Checks whether a graph has no cycles, loops and multi-edges
+    :param graph: The graph in CSR form
+    """
+    n = len(graph)
+    for v in range(n):
+        if v in graph.neighbours_of(v):
+            return False
+    # A graph is a forest iff it has n - c edges, where c is the number of its components
+    return len(graph.neighbours) == 2 * (n - len(components(graph)))
+
+
+def components(graph):
+    """
+    Returns the connected components of a graph
+    :param graph: The graph in CSR form
+    :return: List of lists of vertices
+    """
+    seen = [False] * len(graph)
+    result = []
+    for s in range(len(graph)):
+        if not seen[s]:
+            seen[s] = True
+            component = [s]
+            for v in component:
+                for w in graph.neighbours_of(v):
+                    if not seen[w]:
+                        seen[w] = True
+                        component.append(w)
+            result.append(component)
+    return result
+
+
+def tree_centres(graph, component):
+    """
+    Returns the centres of a tree, by removing leaves until at most two vertices are left
+    :param graph: The forest in CSR form
+    :param component: The vertices of the tree
+    :return: List of one or two vertices
+    """
+    degree = {v: graph.degree(v) for v in component}
+    leaves = [v for v in component if degree[v] <= 1]
+    remaining = len(component)
+    while remaining > 2:
+        remaining -= len(leaves)
+        new_leaves = []
+        for v in leaves:
+            for w in graph.neighbours_of(v):
+                degree[w] -= 1
+                if degree[w] == 1:
+                    new_leaves.append(w)
+        leaves = new_leaves
+    return leaves
+
+
+def rooted_forest(graph):
+    """
+    Roots every tree of a forest at its centre and joins the roots under one new root
+    :param graph: The forest in CSR form
+    :return: Tuple (kinds, children, root) with the kind and the list of children of every vertex of
+    the rooted forest, and its root. The vertices of the graph keep their numbers.
+    """
+    n = len(graph)
+    kinds = [VERTEX] * n
+    children = [[] for v in range(n)]
+    roots = []
+    for component in components(graph):
+        centres = tree_centres(graph, component)
+        if len(centres) == 2:
+            kinds.append(MIDDLE)
+            children.append(list(centres))
+            roots.append(len(kinds) - 1)
+        else:
+            roots.append(centres[0])
+        # Orient the edges away from the centres
+        parent = {c: c for c in centres}
+        stack = list(centres)
+        while stack:
+            v = stack.pop()
+            for w in graph.neighbours_of(v):
+                if w not in parent:
+                    parent[w] = v
+                    children[v].append(w)
+                    stack.append(w)
+    kinds.append(ROOT)
+    children.append(roots)
+    return kinds, children, len(kinds) - 1
+
+
+def ahu_labels(graph):
+    """
+    Computes the AHU labels of the rooted forest of a graph (see rooted_forest). The signature of a
+    vertex is its kind with the sorted labels of its children, and the label of a vertex is the rank
+    of its signature among the signatures on its level.
+    :param graph: The forest in CSR form
+    :return: Tuple (certificate, labels, children): the sorted signatures of every level from the deepest
+    level up, the label of every vertex and the children of every vertex
+    """
+    kinds, children, root = rooted_forest(graph)
+    levels = [[root]]
+    while True:
+        level = [w for v in levels[-1] for w in children[v]]
+        if not level:
+            break
+        levels.append(level)
+    labels = [0] * len(kinds)
+    certificate = []
+    for level in reversed(levels):
+        signatures = [(kinds[v], tuple(sorted(labels[w] for w in children[v]))) for v in level]
+        rank = {signature: i for i, signature in enumerate(sorted(set(signatures)))}
+        for v, signature in zip(level, signatures):
+            labels[v] = rank[signature]
+        certificate.append(tuple(sorted(signatures)))
+    return tuple(certificate), labels, children
+
+
+def forest_certificate(G):
+    """
+    Computes a certificate of a forest: two forests are isomorphic iff their certificates are equal
+    :param G: The forest (`graph.Graph` or `csr_graph.CSRGraph`)
+    :return: The certificate, a hashable tuple
+    """
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    return ahu_labels(graph)[0]
+
+
+def count_forest_automorphisms(G) -> int:
+    """
+    Counts the automorphisms of a forest. Every automorphism fixes the centres of the trees (up to
+    swapping two centres), so they are the automorphisms of the rooted forest: the product over all
+    vertices of m! for every group of m children with isomorphic subtrees.
+    :param G: The forest (`graph.Graph` or `csr_graph.CSRGraph`)
+    :return: The number of automorphisms
+    """
+    graph = G if isinstance(G, CSRGraph) else CSRGraph.from_graph(G)
+    certificate, labels, children = ahu_labels(graph)
+    count = 1
+    for v in range(len(children)):
+        multiplicities = dict()
+        for w in children[v]:
+            multiplicities[labels[w]] = multiplicities.get(labels[w], 0) + 1
+        for m in multiplicities.values():
+            count *= factorial(m)
+    return count
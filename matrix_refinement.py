@@ -1,16 +1,32 @@
+import os
 import time
 import sys
+import numpy as np
 from graph_io import load_graph
-def find_all_isomorphims(graph_list):
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "inleveren"))
+from csr_graph import CSRGraph
+import refinement
+
+# Magic numbers
+PYTHON = 0
+NUMPY = 1
+
+def find_all_isomorphims(graph_list, engine=PYTHON):
     for i in range(0, len(graph_list[0])):
         graph_list[0][i].matrix = graph_list[0][i].to_matrix()
     for i in range(0, len(graph_list[0])):
         for j in range(i + 1, len(graph_list[0])):
-            print((i,j), find_isomorphisms(graph_list[0][i], graph_list[0][j]))
+            if engine == NUMPY:
+                print((i,j), find_isomorphisms_numpy(graph_list[0][i], graph_list[0][j]))
+            else:
+                print((i,j), find_isomorphisms(graph_list[0][i], graph_list[0][j]))
 
 def find_isomorphisms(G, H):
     count = 0
-    matrix_size = len(G.matrix[0])
+    if len(G.matrix) != len(H.matrix):
+        return count
+    matrix_size = len(G.matrix)
     for perm in get_permutations(range(matrix_size), matrix_size):
         if are_equal(G.matrix, H.matrix, perm):
             #count += 1
@@ -18,7 +34,7 @@ def find_isomorphisms(G, H):
     return count
 
 def are_equal(matrixG, matrixH, perm):
-    matrix_size = len(matrixG[0])
+    matrix_size = len(matrixG)
     for i in range(matrix_size):
         for j in range(i+1, matrix_size):
             if matrixG[i][j] != matrixH[perm[i]][perm[j]]:
@@ -31,20 +47,98 @@ def get_permutations(list_of_elements, n):
         return
 
     for i in list_of_elements:
-        tmp = list(list_of_elements)          
+        tmp = list(list_of_elements)
         tmp.remove(i)
         for perm in get_permutations(tmp, n-1):
             yield [i] + perm
 
+def find_isomorphisms_numpy(G, H, count=False):
+    """
+    Searches isomorphisms from G to H with NumPy adjacency matrices. Every vertex of G is only
+    mapped to the vertices of H in its own class of the coarsest stable coloring, and a partial
+    permutation is extended only if the new row agrees with the rows mapped so far.
+    :param G: The graph G, with its adjacency matrix in `G.matrix` (see find_all_isomorphims)
+    :param H: The graph H, with its adjacency matrix in `H.matrix`
+    :param count: Whether to count all isomorphisms instead of stopping at the first one
+    :return: The number of isomorphisms (at most 1 if count is False)
+    """
+    if len(G.matrix) != len(H.matrix):
+        return 0
+    candidates = get_candidates(G, H)
+    if candidates is None:
+        return 0
+    A = np.array(G.matrix, dtype=bool).reshape(len(G.matrix), len(G.matrix))
+    B = np.array(H.matrix, dtype=bool).reshape(len(H.matrix), len(H.matrix))
+    return extend_permutation(A, B, candidates, [], np.zeros(len(B), dtype=bool), count)
+
+def get_candidates(G, H):
+    """
+    Restricts the images of the vertices of G to their color classes in the coarsest stable
+    coloring of the disjoint union of G and H (see inleveren/refinement.py)
+    :param G: The graph G
+    :param H: The graph H
+    :return: List with an array of the candidate images of every vertex of G,
+    or None if the coloring is unbalanced
+    """
+    n = len(G.matrix)
+    graph = CSRGraph.from_graph(G).disjoint_union(CSRGraph.from_graph(H))
+    result, colors = refinement.coarsest_stable_coloring(graph, refinement.initial_coloring(graph), n)
+    if result == refinement.NO:
+        return None
+    colors = np.array(colors, dtype=np.int64)
+    return [np.flatnonzero(colors[n:] == colors[v]) for v in range(n)]
+
+def is_isomorphism(A, B, perm):
+    """
+    Checks a bijection with one fancy-indexed comparison of the adjacency matrices
+    :param A: The adjacency matrix of G
+    :param B: The adjacency matrix of H
+    :param perm: Array that maps every vertex of G to a vertex of H
+    :return: Whether `perm` is an isomorphism
+    """
+    return np.array_equal(A, B[np.ix_(perm, perm)])
+
+def extend_permutation(A, B, candidates, perm, used, count):
+    """
+    Extends a partial permutation row by row. Vertex k = len(perm) of G may be mapped to a candidate c
+    only if row k of A agrees with row c of B on the vertices mapped so far and on k itself.
+    When all rows agree, the permutation is an isomorphism (the matrices are symmetric); it is verified
+    with is_isomorphism.
+    :param A: The adjacency matrix of G
+    :param B: The adjacency matrix of H
+    :param candidates: The candidate images of every vertex of G (see get_candidates)
+    :param perm: List with the images of the vertices 0, ..., k - 1
+    :param used: Boolean array of the vertices of H in `perm`
+    :param count: Whether to count all isomorphisms instead of stopping at the first one
+    :return: The number of isomorphisms extending `perm` (at most 1 if count is False)
+    """
+    k = len(perm)
+    if k == len(A):
+        return 1 if is_isomorphism(A, B, np.array(perm, dtype=np.intp)) else 0
+    num = 0
+    row = A[k, :k + 1]
+    for c in candidates[k][~used[candidates[k]]]:
+        perm.append(c)
+        if np.array_equal(row, B[c, perm]):
+            used[c] = True
+            num += extend_permutation(A, B, candidates, perm, used, count)
+            used[c] = False
+        perm.pop()
+        if num > 0 and not count:
+            break
+    return num
+
 if __name__ == "__main__":
     """
     Main function
     :param 1: The .grl-file
+    :param 2: (Optional) python for the brute-force engine (default) or numpy for the NumPy engine
     """
     start = time.time()
+    engine = NUMPY if len(sys.argv) > 2 and sys.argv[2] == "numpy" else PYTHON
     with open(sys.argv[1]) as f:
         graph_list = load_graph(f, read_list=True)
-        find_all_isomorphims(graph_list)
+        find_all_isomorphims(graph_list, engine)
 
     end = time.time()
     print("Elapsed time (total): " + str(int((end-start)*1000)) + " ms")
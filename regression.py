@@ -0,0 +1,728 @@
+"""
+Regression checks of the engine in inleveren/: every check compares a part of the program with a
+brute-force or round-trip result on small random graphs, so it needs no expected output.
+Run it after a change, next to tests.sh:
+    python3 regression.py [check ...]
+Without arguments all checks are run; the exit status is 1 when one of them fails. Checks that need
+a module that is not installed are skipped.
+"""
+from collections import Counter
+from contextlib import redirect_stdout
+from itertools import permutations
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import zipfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "inleveren"))
+from canonical import canonical_form
+from csr_graph import CSRGraph
+from graph import Graph, matrix_entries
+from graph_io import (build_graph, iter_graphs, save_graph, load_graph6, write_graph6, load_edge_list, write_edge_list,
+                      load_graph_file, ARCHIVE_SEPARATOR)
+import graph_cache
+from invariants import fingerprint, stable_coloring
+from memo import LRUMemo
+import result_cache
+from trees import is_forest, forest_certificate, count_forest_automorphisms
+from modules import modular_decomposition, module_certificate, count_module_automorphisms
+import ind_refinement
+from ind_refinement import find_automorphisms
+from permutation_group import PermutationGroup
+import refinement
+
+# Magic numbers
+SEED = 2017
+ROUNDS = 60  # Number of random graphs per check
+MAX_VERTICES = 7  # Brute force tries all n! permutations
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "other", "results.txt")
+
+# Global variables
+checks = []  # The checks, in the order in which they are run
+
+
+def check(function):
+    """
+    Registers a check: a function without arguments that raises an AssertionError when it fails
+    :param function: The check
+    :return: The check
+    """
+    checks.append(function)
+    return function
+
+
+def random_edges(rng, n, p, loops=False, multi=False):
+    """
+    Draws a random edge list
+    :param rng: The random number generator
+    :param n: The number of vertices
+    :param p: The probability of every edge
+    :param loops: Whether loops may occur
+    :param multi: Whether multi-edges may occur
+    :return: List of (tail, head) tuples
+    """
+    edges = [(u, v) for u in range(n) for v in range(u if loops else u + 1, n) if rng.random() < p]
+    if multi and edges:
+        edges += rng.sample(edges, rng.randint(0, min(3, len(edges))))
+    return edges
+
+
+def random_graphs(rng, simple=False):
+    """
+    Draws small random graphs, with loops and multi-edges unless `simple` is set
+    :param rng: The random number generator
+    :param simple: Whether the graphs have to be simple
+    :return: Iterator of (n, edges)-tuples
+    """
+    for _ in range(ROUNDS):
+        n = rng.randint(1, MAX_VERTICES)
+        yield n, random_edges(rng, n, rng.random(), not simple and rng.random() < 0.3,
+                              not simple and rng.random() < 0.3)
+
+
+def edge_multiset(edges, p=None):
+    """
+    Returns the edges of a graph as a multiset of unordered pairs, after applying a permutation
+    :param edges: List of (tail, head) tuples
+    :param p: The permutation, or None for the identity
+    :return: `Counter` of (min, max) tuples
+    """
+    if p is not None:
+        edges = [(p[u], p[v]) for u, v in edges]
+    return Counter((min(u, v), max(u, v)) for u, v in edges)
+
+
+def brute_force_automorphisms(n, edges):
+    """
+    Lists the automorphisms of a graph by trying all permutations
+    :param n: The number of vertices
+    :param edges: List of (tail, head) tuples
+    :return: List of permutations (tuples)
+    """
+    original = edge_multiset(edges)
+    return [p for p in permutations(range(n)) if edge_multiset(edges, p) == original]
+
+
+def brute_force_closure(n, generators):
+    """
+    Lists the elements of the group generated by some permutations, by composing until nothing is new
+    :param n: The degree
+    :param generators: List of permutations
+    :return: Set of permutations (tuples)
+    """
+    group = {tuple(range(n))}
+    new = list(group)
+    while new:
+        p = new.pop()
+        for g in generators:
+            q = tuple(g[p[v]] for v in range(n))
+            if q not in group:
+                group.add(q)
+                new.append(q)
+    return group
+
+
+def brute_force_certificate(n, edges):
+    """
+    Computes a certificate of a graph by trying all permutations: the smallest sorted edge list
+    :param n: The number of vertices
+    :param edges: List of (tail, head) tuples
+    :return: The certificate
+    """
+    return n, tuple(min(sorted(edge_multiset(edges, p).elements()) for p in permutations(range(n))))
+
+
+def relabel(rng, n, edges):
+    """
+    Returns a copy of a graph with the vertices numbered at random
+    :param rng: The random number generator
+    :param n: The number of vertices
+    :param edges: List of (tail, head) tuples
+    :return: The edges of the copy
+    """
+    p = rng.sample(range(n), n)
+    return [(p[u], p[v]) for u, v in edges]
+
+
+def random_forests(rng):
+    """
+    Draws small random forests, with the vertices numbered at random
+    :param rng: The random number generator
+    :return: Iterator of (n, edges)-tuples
+    """
+    for _ in range(ROUNDS):
+        n = rng.randint(1, MAX_VERTICES + 1)
+        yield n, relabel(rng, n, [(rng.randrange(v), v) for v in range(1, n) if rng.random() < 0.85])
+
+
+def component_count(n, edges):
+    """
+    Counts the connected components of a graph
+    :param n: The number of vertices
+    :param edges: List of (tail, head) tuples
+    :return: The number of components
+    """
+    component = list(range(n))
+    for u, v in edges:
+        old, new = component[u], component[v]
+        component = [new if c == old else c for c in component]
+    return len(set(component))
+
+
+def random_modular_graphs(rng):
+    """
+    Draws small random simple graphs with nontrivial modules, by substituting random graphs for the
+    vertices of a random quotient graph, and numbers their vertices at random
+    :param rng: The random number generator
+    :return: Iterator of (n, edges)-tuples
+    """
+    for _ in range(ROUNDS):
+        sizes = [rng.randint(1, 3) for _ in range(rng.randint(1, 4))]
+        while sum(sizes) > MAX_VERTICES:
+            sizes.pop()
+        starts = [sum(sizes[:i]) for i in range(len(sizes))]
+        edges = []
+        for i, j in random_edges(rng, len(sizes), rng.random()):
+            edges += [(starts[i] + u, starts[j] + v) for u in range(sizes[i]) for v in range(sizes[j])]
+        for start, size in zip(starts, sizes):
+            edges += [(start + u, start + v) for u, v in random_edges(rng, size, rng.random())]
+        yield sum(sizes), relabel(rng, sum(sizes), edges)
+
+
+def is_module(n, edges, vertices):
+    """
+    Checks whether every vertex outside a set is adjacent to all or none of its vertices
+    :param n: The number of vertices
+    :param edges: List of (tail, head) tuples
+    :param vertices: The set
+    """
+    adjacent = {(u, v) for u, v in edges} | {(v, u) for u, v in edges}
+    return all(len({(w, v) in adjacent for v in vertices}) == 1 for w in range(n) if w not in vertices)
+
+
+def read_results(path):
+    """
+    Reads the expected results of the graph files, see other/results.txt
+    :param path: The path of the results
+    :return: Dictionary of name -> list of (class, number of automorphisms) tuples
+    """
+    results = dict()
+    name = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.endswith(':'):
+                name = line[:-1]
+                results[name] = []
+            elif line:
+                indices, count = line.split()
+                results[name].append((sorted(int(i) for i in indices.strip('[]').split(',')), int(count)))
+    return results
+
+
+def csr_arrays(graph):
+    """
+    Returns the arrays of a graph in CSR form, to compare graphs
+    :param graph: The graph in CSR form
+    :return: Tuple (n, offsets, neighbours) with the arrays as lists
+    """
+    return len(graph), list(graph.offsets), list(graph.neighbours)
+
+
+def replace_int(data, header, index, value):
+    """
+    Replaces an int of a graph cache (see graph_cache.py)
+    :param data: The contents of the cache
+    :param header: The length of the header
+    :param index: The index of the int after the header
+    :param value: The new value
+    :return: The new contents
+    """
+    position = header + index * graph_cache.ITEMSIZE
+    return (data[:position] + value.to_bytes(graph_cache.ITEMSIZE, sys.byteorder, signed=True) +
+            data[position + graph_cache.ITEMSIZE:])
+
+
+def classes_of(colors):
+    """
+    Returns the color classes of a coloring, independent of the numbering of the colors
+    :param colors: List with the color of every vertex
+    :return: Sorted list of tuples of vertices
+    """
+    classes = dict()
+    for v, color in enumerate(colors):
+        classes.setdefault(color, []).append(v)
+    return sorted(tuple(vertices) for vertices in classes.values())
+
+
+def naive_stable_coloring(n, edges, colors):
+    """
+    Computes the coarsest stable coloring by recoloring all vertices until the number of colors is constant
+    :param n: The number of vertices
+    :param edges: List of (tail, head) tuples
+    :param colors: The initial coloring
+    :return: The coloring
+    """
+    neighbours = [[] for _ in range(n)]
+    for u, v in edges:
+        neighbours[u].append(v)
+        if u != v:
+            neighbours[v].append(u)
+    while True:
+        signatures = [(colors[v], tuple(sorted(colors[w] for w in neighbours[v]))) for v in range(n)]
+        numbers = {signature: i for i, signature in enumerate(sorted(set(signatures)))}
+        new = [numbers[signature] for signature in signatures]
+        if len(set(new)) == len(set(colors)):
+            return new
+        colors = new
+
+
+@check
+def stable_colorings():
+    """
+    The partition refinement engine finds the same coarsest stable coloring as naive recoloring
+    """
+    rng = random.Random(SEED)
+    for n, edges in random_graphs(rng):
+        graph = CSRGraph.from_edges(n, edges)
+        colors = refinement.initial_coloring(graph)
+        result, stable = refinement.coarsest_stable_coloring(graph, colors)
+        assert classes_of(stable) == classes_of(naive_stable_coloring(n, edges, colors)), (n, edges)
+
+
+@check
+def undo_trail():
+    """
+    Undoing individualisations restores the partition, also after several levels
+    """
+    rng = random.Random(SEED)
+    for n, edges in random_graphs(rng):
+        graph = CSRGraph.from_edges(n, edges)
+        partition = refinement.new_partition(graph, refinement.initial_coloring(graph))
+        partition.refine()
+        marks = []
+        colors = []
+        while len(partition) < n:
+            marks.append(partition.mark())
+            colors.append(partition.colors())
+            partition.individualise(rng.choice(partition.cell(partition.first_nontrivial_cell())))
+        while marks:
+            partition.undo(marks.pop())
+            assert partition.colors() == colors.pop(), (n, edges)
+
+
+@check
+def automorphism_search():
+    """
+    The pruned automorphism search finds generators of the whole automorphism group
+    """
+    rng = random.Random(SEED)
+    for n, edges in random_graphs(rng):
+        automorphisms = brute_force_automorphisms(n, edges)
+        group = find_automorphisms(CSRGraph.from_edges(n, edges))
+        assert group.order() == len(automorphisms), (n, edges, group.order(), len(automorphisms))
+        assert set(map(tuple, group.strong_generators)) <= set(automorphisms), (n, edges)
+
+
+@check
+def permutation_groups():
+    """
+    Schreier-Sims finds the order, the elements and the orbits of groups given by random generators
+    """
+    rng = random.Random(SEED)
+    for _ in range(ROUNDS):
+        n = rng.randint(1, 6)
+        generators = [rng.sample(range(n), n) for _ in range(rng.randint(0, 3))]
+        group = PermutationGroup(n, generators, rng.sample(range(n), rng.randint(0, n)))
+        elements = brute_force_closure(n, generators)
+        assert group.order() == len(elements), (n, generators)
+        for p in permutations(range(n)):
+            assert group.contains(p) == (p in elements), (n, generators, p)
+        for x in range(n):
+            assert group.orbit(x) == {p[x] for p in elements}, (n, generators, x)
+
+
+@check
+def canonical_forms():
+    """
+    Canonical forms are equal iff the graphs are isomorphic, also after numbering the vertices at random
+    """
+    rng = random.Random(SEED)
+    graphs = list(random_graphs(rng))
+    graphs += [(n, relabel(rng, n, edges)) for n, edges in graphs]
+    certificates = [canonical_form(CSRGraph.from_edges(n, edges)) for n, edges in graphs]
+    expected = [brute_force_certificate(n, edges) for n, edges in graphs]
+    for i in range(len(graphs)):
+        for j in range(i, len(graphs)):
+            assert (certificates[i] == certificates[j]) == (expected[i] == expected[j]), (graphs[i], graphs[j])
+
+
+@check
+def results_file():
+    """
+    The isomorphism classes and automorphism counts of the graph files are those in other/results.txt
+    """
+    for name, expected in sorted(read_results(RESULTS).items()):
+        with open(os.path.join(os.path.dirname(RESULTS), name + ".grl")) as f:
+            graphs = list(iter_graphs(f, CSRGraph))
+        with redirect_stdout(io.StringIO()):
+            classes = ind_refinement.find_all_isomorphisms([graphs])
+            found = [(sorted(c), ind_refinement.count_automorphisms(graphs[c[0]], c[0])) for c in classes]
+        assert sorted(found) == sorted(expected), (name, found)
+
+
+@check
+def fingerprints():
+    """
+    Renumbered copies have the same fingerprint, so graphs with different fingerprints are not isomorphic
+    """
+    rng = random.Random(SEED)
+    for n, edges in random_graphs(rng):
+        copy = relabel(rng, n, edges)
+        found = [fingerprint(graph, stable_coloring(graph)) for graph in
+                 (CSRGraph.from_edges(n, edges), CSRGraph.from_edges(n, copy))]
+        assert found[0] == found[1] == fingerprint(CSRGraph.from_edges(n, copy)), (n, edges, copy)
+
+
+@check
+def numpy_colorings():
+    """
+    The NumPy engine finds the same stable colorings and results as refinement.py, also on disjoint unions
+    """
+    import numpy_refinement
+
+    rng = random.Random(SEED)
+    # A vertex adjacent to a path has many neighbour colors, which the padded rows do not fit
+    hub = (200, [(0, v) for v in range(1, 200)] + [(v, v + 1) for v in range(1, 199)])
+    for n, edges in list(random_graphs(rng)) + [hub]:
+        graph = CSRGraph.from_edges(n, edges)
+        union = graph.disjoint_union(CSRGraph.from_edges(n, relabel(rng, n, random_edges(rng, n, 0.5))))
+        for G, left in ((graph, None), (union, n)):
+            colors = refinement.initial_coloring(G)
+            result, stable = numpy_refinement.coarsest_stable_coloring(G, colors, left)
+            expected, expected_stable = refinement.coarsest_stable_coloring(G, colors, left)
+            # The result is only defined for a disjoint union, and refinement.py stops as soon as it is NO
+            assert left is None or result == expected, (n, edges, result, expected)
+            assert expected == refinement.NO or classes_of(stable) == classes_of(expected_stable), (n, edges, left)
+
+
+@check
+def parallel_search():
+    """
+    With worker processes, the automorphism counts and isomorphism classes are those of the serial search
+    """
+    rng = random.Random(SEED)
+    graphs = [(n, edges) for n, edges in random_graphs(rng)][:20]
+    graphs += [(n, relabel(rng, n, edges)) for n, edges in graphs]
+    ind_refinement.processes = 2
+    try:
+        for n, edges in graphs:
+            order = find_automorphisms(CSRGraph.from_edges(n, edges)).order()
+            assert order == len(brute_force_automorphisms(n, edges)), (n, edges, order)
+        with redirect_stdout(io.StringIO()):
+            classes = ind_refinement.find_all_isomorphisms([[CSRGraph.from_edges(n, edges) for n, edges in graphs]])
+    finally:
+        ind_refinement.processes = 1
+    expected = dict()
+    for i, (n, edges) in enumerate(graphs):
+        expected.setdefault(brute_force_certificate(n, edges), []).append(i)
+    assert sorted(classes) == sorted(expected.values())
+
+
+@check
+def graph_caches():
+    """
+    The binary graph cache gives back the graphs of the file, and damaged caches are parsed again
+    """
+    rng = random.Random(SEED)
+    graphs = [build_graph(Graph, n, [(u, v, None) for u, v in edges]) for n, edges in random_graphs(rng)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "random.grl")
+        with open(path, "w") as f:
+            save_graph(graphs, f)
+        with open(path) as f:
+            expected = [csr_arrays(graph) for graph in iter_graphs(f, CSRGraph)]
+        assert [csr_arrays(graph) for graph in graph_cache.load_graphs(path)] == expected
+        digest = graph_cache.file_digest(path)
+        cached = graph_cache.read_cache(graph_cache.cache_path(path), digest)
+        assert cached is not None and [csr_arrays(graph) for graph in cached] == expected
+        # Unmap the cache before overwriting it
+        del cached
+        with open(graph_cache.cache_path(path), "rb") as f:
+            data = f.read()
+        header = len(graph_cache.MAGIC) + len(digest)
+        # The ints are the number of graphs, the sizes, and the offsets and neighbours of every graph
+        i = next(i for i in range(len(expected)) if expected[i][2])
+        n = expected[i][0]
+        offsets = 1 + 2 * len(expected) + sum(m + 1 + len(neighbours) for m, _, neighbours in expected[:i])
+        damaged = {
+            "truncated": data[:len(data) // 2],
+            "too many graphs": replace_int(data, header, 0, 2 * len(expected)),
+            "decreasing offsets": replace_int(data, header, offsets + 1, len(expected[i][2]) + 1),
+            "neighbour out of range": replace_int(data, header, offsets + n + 1, n),
+        }
+        for name, contents in damaged.items():
+            with open(graph_cache.cache_path(path), "wb") as f:
+                f.write(contents)
+            assert graph_cache.read_cache(graph_cache.cache_path(path), digest) is None, name
+            assert [csr_arrays(graph) for graph in graph_cache.load_graphs(path)] == expected, name
+
+
+@check
+def graph_formats():
+    """
+    Graphs survive a round trip through graph6 (simple graphs), sparse6 and edge lists, including
+    isolated vertices, loops, multi-edges and the weights of edge lists
+    """
+    rng = random.Random(SEED)
+    for simple in (True, False):
+        graphs = [(n, edges) for n, edges in random_graphs(rng, simple)]
+        expected = [(n, edge_multiset(edges)) for n, edges in graphs]
+        for sparse in (False, True) if simple else (True,):
+            f = io.StringIO()
+            write_graph6([CSRGraph.from_edges(n, edges) for n, edges in graphs], f, sparse, header=True)
+            f.seek(0)
+            found = [(len(graph), edge_multiset(graph.edges())) for graph in load_graph6(f, CSRGraph)]
+            assert found == expected, ("sparse6" if sparse else "graph6", simple)
+        for n, edges in graphs:
+            weights = [rng.randint(1, 9) for _ in edges]
+            f = io.StringIO()
+            write_edge_list(build_graph(Graph, n, [(u, v, w) for (u, v), w in zip(edges, weights)]), f)
+            f.seek(0)
+            graph = load_edge_list(f)
+            label = {vertex: i for i, vertex in enumerate(graph.vertices)}
+            found = Counter((min(label[e.tail], label[e.head]), max(label[e.tail], label[e.head]), e.weight)
+                            for e in graph.edges)
+            assert len(graph) == n and found == Counter((min(u, v), max(u, v), w)
+                                                        for (u, v), w in zip(edges, weights)), (n, edges)
+
+
+@check
+def graph_archives():
+    """
+    Graphs read from a zip archive, with or without the name of the member, are those of the file itself
+    """
+    rng = random.Random(SEED)
+    graphs = [build_graph(Graph, n, [(u, v, None) for u, v in edges]) for n, edges in random_graphs(rng)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "random.grl")
+        with open(path, "w") as f:
+            save_graph(graphs, f)
+        archive = os.path.join(directory, "random.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as f:
+            f.write(path, "random.grl")
+        expected = [csr_arrays(graph) for graph in load_graph_file(path, CSRGraph)[0]]
+        for name in (archive, archive + ARCHIVE_SEPARATOR + "random.grl"):
+            assert [csr_arrays(graph) for graph in load_graph_file(name, CSRGraph)[0]] == expected, name
+            # The first load writes the cache, the second reads it
+            for _ in range(2):
+                assert [csr_arrays(graph) for graph in graph_cache.load_graphs(name)] == expected, name
+
+
+@check
+def result_caches():
+    """
+    The result cache gives back stored certificates and counts after reopening, keeps its total size below
+    the bound, treats damaged entries as missing and is emptied when its format version differs
+    """
+    rng = random.Random(SEED)
+    graphs = [CSRGraph.from_edges(n, edges) for n, edges in random_graphs(rng)]
+    keys = [result_cache.graph_key(graph) for graph in graphs]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.sqlite3")
+        cache = result_cache.ResultCache(path)
+        certificates = result_cache.cached_map(canonical_form, graphs, result_cache.CERTIFICATE, cache, keys)
+        counts = [find_automorphisms(graph).order() * 2 ** 70 for graph in graphs]
+        for key, count in zip(keys, counts):
+            cache.put(key, result_cache.AUTOMORPHISMS, count)
+        cache.close()
+        cache = result_cache.ResultCache(path)
+        assert result_cache.cached_map(canonical_form, graphs, result_cache.CERTIFICATE, cache, keys) == certificates
+        assert [cache.get(key, result_cache.AUTOMORPHISMS) for key in keys] == counts
+        assert cache.misses == 0
+        cache.close()
+
+        connection = sqlite3.connect(path)
+        connection.execute("UPDATE results SET value = 'damaged(' WHERE graph = ?", (keys[0],))
+        connection.commit()
+        connection.close()
+        cache = result_cache.ResultCache(path, max_bytes=1000)
+        assert cache.get(keys[0], result_cache.CERTIFICATE) is None
+        cache.put(keys[0], result_cache.CERTIFICATE, certificates[0])
+        cache.close()
+        connection = sqlite3.connect(path)
+        total = connection.execute("SELECT value FROM meta WHERE name = 'total'").fetchone()[0]
+        assert total == connection.execute("SELECT SUM(size) FROM results").fetchone()[0] and total <= 1000
+        # The most recently stored entry is kept
+        assert connection.execute("SELECT COUNT(*) FROM results WHERE graph = ? AND field = ?",
+                                  (keys[0], result_cache.CERTIFICATE)).fetchone()[0] == 1
+        connection.execute("UPDATE meta SET value = value - 1 WHERE name = 'version'")
+        connection.commit()
+        connection.close()
+        cache = result_cache.ResultCache(path)
+        assert all(cache.get(key, result_cache.CERTIFICATE) is None for key in keys)
+        cache.close()
+
+
+@check
+def memos():
+    """
+    LRUMemo behaves like a list of entries ordered by their last use, of which the oldest is dropped
+    """
+    rng = random.Random(SEED)
+    for _ in range(ROUNDS):
+        size = rng.randint(0, 4)
+        memo = LRUMemo(size)
+        entries = []
+        hits = misses = 0
+        for _ in range(50):
+            key = rng.randrange(8)
+            found = [entry for entry in entries if entry[0] == key]
+            if rng.random() < 0.5:
+                value = memo.get(key)
+                if found:
+                    hits += 1
+                    entries.remove(found[0])
+                    entries.append(found[0])
+                else:
+                    misses += 1
+                assert value == (found[0][1] if found else None), (size, entries, key)
+            else:
+                value = rng.random()
+                memo.put(key, value)
+                # A memo of size 0 stores nothing
+                if size > 0:
+                    entries = [entry for entry in entries if entry[0] != key] + [(key, value)]
+                    del entries[:-size]
+            assert (len(memo), memo.hits, memo.misses) == (len(entries), hits, misses), (size, entries)
+
+
+@check
+def bitset_partitions():
+    """
+    The bitset backend finds the same stable colorings and automorphism counts as the CSR backend
+    """
+    rng = random.Random(SEED)
+    used = 0
+    refinement.bitsets = True
+    try:
+        for n, edges in random_graphs(rng):
+            graph = CSRGraph.from_edges(n, edges)
+            colors = refinement.initial_coloring(graph)
+            partition = refinement.new_partition(graph, colors)
+            used += isinstance(partition, refinement.BitsetPartition)
+            partition.refine()
+            assert classes_of(partition.colors()) == classes_of(naive_stable_coloring(n, edges, colors)), (n, edges)
+            order = find_automorphisms(graph).order()
+            assert order == len(brute_force_automorphisms(n, edges)), (n, edges, order)
+    finally:
+        refinement.bitsets = False
+    assert used > 0
+
+
+@check
+def sparse_matrices():
+    """
+    The sparse adjacency matrices have the entries of the dense one, and graphs built from them have it too
+    """
+    rng = random.Random(SEED)
+    for n, edges in random_graphs(rng):
+        graph = build_graph(Graph, n, [(u, v, None) for u, v in edges])
+        matrix = graph.to_matrix()
+        expected = sorted(matrix_entries(matrix)[1])
+        for kind in ("csr", "coo"):
+            sparse = graph.to_sparse_matrix(kind)
+            assert sorted(matrix_entries(sparse, n)[1]) == expected, (n, edges, kind)
+            assert Graph.from_matrix(sparse, n=n).to_matrix() == matrix, (n, edges, kind)
+            assert csr_arrays(CSRGraph.from_matrix(sparse, n)) == csr_arrays(CSRGraph.from_matrix(matrix)), (n, edges)
+
+
+@check
+def forests():
+    """
+    Forests are recognised, counted and canonised like brute force does, and other graphs are no forests
+    """
+    rng = random.Random(SEED)
+    graphs = list(random_forests(rng))
+    for n, edges in graphs:
+        graph = CSRGraph.from_edges(n, edges)
+        assert is_forest(graph), (n, edges)
+        assert count_forest_automorphisms(graph) == len(brute_force_automorphisms(n, edges)), (n, edges)
+    graphs += [(n, relabel(rng, n, edges)) for n, edges in graphs]
+    certificates = [forest_certificate(CSRGraph.from_edges(n, edges)) for n, edges in graphs]
+    expected = [brute_force_certificate(n, edges) for n, edges in graphs]
+    for i in range(len(graphs)):
+        for j in range(i, len(graphs)):
+            assert (certificates[i] == certificates[j]) == (expected[i] == expected[j]), (graphs[i], graphs[j])
+    for n, edges in random_graphs(rng):
+        acyclic = len(edges) == n - component_count(n, edges)
+        assert is_forest(CSRGraph.from_edges(n, edges)) == acyclic, (n, edges)
+
+
+@check
+def modules():
+    """
+    The nodes of the modular decomposition are modules, and the certificates and automorphism counts of
+    graphs with modules agree with brute force, also through the result cache
+    """
+    rng = random.Random(SEED)
+    graphs = list(random_modular_graphs(rng)) + list(random_graphs(rng, True))
+    graphs += [(n, relabel(rng, n, edges)) for n, edges in graphs]
+    for n, edges in graphs:
+        graph = CSRGraph.from_edges(n, edges)
+        kinds, children, masks = modular_decomposition(graph)
+        for mask in masks:
+            assert is_module(n, edges, {v for v in range(n) if mask >> v & 1}), (n, edges, mask)
+        count = count_module_automorphisms(graph)
+        assert count is None or count == len(brute_force_automorphisms(n, edges)), (n, edges, count)
+    certificates = [ind_refinement.get_certificate(CSRGraph.from_edges(n, edges)) for n, edges in graphs]
+    assert any(module_certificate(CSRGraph.from_edges(n, edges)) is not None for n, edges in graphs)
+    expected = [brute_force_certificate(n, edges) for n, edges in graphs]
+    for i in range(len(graphs)):
+        for j in range(i, len(graphs)):
+            assert (certificates[i] == certificates[j]) == (expected[i] == expected[j]), (graphs[i], graphs[j])
+    with tempfile.TemporaryDirectory() as directory:
+        ind_refinement.result_cache = result_cache.ResultCache(os.path.join(directory, "results.sqlite3"))
+        try:
+            with redirect_stdout(io.StringIO()):
+                for _ in range(2):
+                    for i, (n, edges) in enumerate(graphs):
+                        count = ind_refinement.count_automorphisms(CSRGraph.from_edges(n, edges), i)
+                        assert count == len(brute_force_automorphisms(n, edges)), (n, edges, count)
+            assert ind_refinement.result_cache.hits > 0
+        finally:
+            ind_refinement.result_cache.close()
+            ind_refinement.result_cache = None
+
+
+def main():
+    """
+    Runs the checks named on the command line, or all of them
+    """
+    names = sys.argv[1:]
+    unknown = set(names) - {function.__name__ for function in checks}
+    if unknown:
+        print("Unknown checks: " + ", ".join(sorted(unknown)) + "\nChecks: " +
+              " ".join(function.__name__ for function in checks))
+        sys.exit(2)
+    failed = 0
+    for function in checks:
+        if names and function.__name__ not in names:
+            continue
+        try:
+            function()
+            print("OK    " + function.__name__)
+        except AssertionError as error:
+            failed += 1
+            print("FAIL  " + function.__name__ + ": " + str(error)[:200])
+        except ImportError as error:
+            # Optional dependencies, such as NumPy
+            print("SKIP  " + function.__name__ + ": " + str(error))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
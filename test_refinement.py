@@ -1,8 +1,20 @@
-from graph_io import load_graph, write_dot
+from graph_io import load_graph, write_dot, build_graph
+from graph import Graph
+from array import array
+import hashlib
+import os
 import random
 import sys
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "inleveren"))
+from invariants import fingerprint
+from csr_graph import CSRGraph
+from parallel import parallel_map, default_processes
+from graph_cache import load_graphs
+from result_cache import graph_key
+from memo import LRUMemo
+
 # Magic numbers
 NO = 0
 YES = 1
@@ -17,6 +29,15 @@ BIGGEST = 1
 RANDOM = 2
 DEGREE = 0
 FLAT = 1
+PYTHON = 0
+NUMPY = 1
+MEMO_SIZE = 1024
+
+# Global variables
+backend = PYTHON
+worker_graphs = []  # The graphs of a worker process of refine_all
+worker_options = ()  # The options of a worker process of refine_all
+refinement_memo = LRUMemo(MEMO_SIZE)  # (scope, coloring key) -> (result, stable coloring), see count_isomorphisms
 
 def add_vertex_to_partitions(partitions, key, value):
     """
@@ -33,15 +54,15 @@ def add_vertex_to_partitions(partitions, key, value):
 
 def get_neighbourhood(v):  
     """
-    Get a sorted list of all the colors of all the neighbours
+    Get a sorted tuple of all the colors of all the neighbours, usable as dictionary key
     :param v: The vertex
-    :return: The sorted list
+    :return: The sorted tuple
     """
     result = []
     for n in v.neighbours:
         result.append(n.colornum)
     result.sort()
-    return result
+    return tuple(result)
 
 
 def get_copied_vertex(original, copy, vertex):
@@ -51,46 +72,81 @@ def get_copied_vertex(original, copy, vertex):
     :param copy: Copy of the graph
     :return: The sorted list
     """
-    index = original.vertices.index(vertex)
-    return copy.vertices[index]
-
-
-def get_color_of_neighbourhood(n, lst):
-    """
-    Get the color for which the same colored neighbourhood is already in the list
-    :param n: List of neighbour colors
-    :param lst: The 'update-list' with the following tuples: (color, vertex, neighbourhood)
-    :return: the found color or -1
-    """
-    for i in range(len(lst)):
-        if lst[i][NEIGHBOURS] == n:
-            return lst[i][COLOR]
-    return UNKNOWN
+    index = original.index_of(vertex)
+    return copy.vertex_view[index]
 
 
-def refine_all(L, colorclass_choice, coloring_choice, fast):
+def refine_all(L, colorclass_choice, coloring_choice, fast, processes=1):
     """
-    Refine and verify all graphs in a list from the .grl file
+    Refine and verify all graphs in a list from the .grl file. Pairs with different fingerprints
+    (see inleveren/invariants.py) are not isomorphic and are skipped.
+    With `processes` > 1 the pairs are tested by a pool of worker processes, which receive the
+    graphs once, in CSR form, and test their pairs on their own copies.
     :param L: The list of graphs
+    :param processes: The number of worker processes
+    :return: Dictionary with the result of every tested pair (i, j)
     """
-    alg_time = 0
+    fingerprints = [fingerprint(G) for G in L[0]]
+    pairs = []
     for i in range(0, len(L[0])):
         for j in range(i + 1, len(L[0])):
-            # Starting the algorithm on (i, j)
-            start_alg = time.time()
-            G = L[0][i]
-            H = L[0][j]
-            if coloring_choice == DEGREE:
-                initial_coloring(G)
-                initial_coloring(H)
-            else:
-                initial_flat_coloring(G)
-                initial_flat_coloring(H)
-            isomorphisms = find_isomorphisms(G, H, colorclass_choice, fast)
-            end_alg = time.time()
-            alg_time += end_alg - start_alg
-            #print("("+str(i)+","+str(j)+") "+str(isomorphisms))
+            if fingerprints[i] == fingerprints[j]:
+                pairs.append((i, j))
+    # Starting the algorithm on all pairs
+    start_alg = time.time()
+    if processes > 1:
+        graphs = [CSRGraph.from_graph(G) for G in L[0]]
+        results = parallel_map(test_pair, pairs, processes, init_worker,
+                               (graphs, (colorclass_choice, coloring_choice, fast), backend))
+    else:
+        results = [test_isomorphism(L[0][i], L[0][j], colorclass_choice, coloring_choice, fast) for i, j in pairs]
+    end_alg = time.time()
+    alg_time = end_alg - start_alg
+    #for (i, j), isomorphisms in zip(pairs, results):
+    #    print("("+str(i)+","+str(j)+") "+str(isomorphisms))
     #print("Elapsed time (algorithm): " + str(int(alg_time*1000)) + " ms")
+    return dict(zip(pairs, results))
+
+
+def test_isomorphism(G, H, colorclass_choice, coloring_choice, fast):
+    """
+    Colors graphs G and H initially and counts their isomorphisms
+    :param G: The graph G
+    :param H: The graph H
+    :return: The number of isomorphisms
+    """
+    if coloring_choice == DEGREE:
+        initial_coloring(G)
+        initial_coloring(H)
+    else:
+        initial_flat_coloring(G)
+        initial_flat_coloring(H)
+    return find_isomorphisms(G, H, colorclass_choice, fast)
+
+
+def init_worker(graphs, options, refinement_backend):
+    """
+    Prepares a worker process of refine_all
+    :param graphs: The list of graphs in CSR form
+    :param options: Tuple (colorclass_choice, coloring_choice, fast)
+    :param refinement_backend: The backend (PYTHON or NUMPY)
+    """
+    global worker_graphs, worker_options, backend, numpy_refinement
+    worker_graphs = [build_graph(Graph, len(G), [(u, v, None) for u, v in G.edges()]) for G in graphs]
+    worker_options = options
+    backend = refinement_backend
+    if backend == NUMPY:
+        import numpy_refinement
+
+
+def test_pair(pair):
+    """
+    Tests one pair of graphs in a worker process of refine_all
+    :param pair: Tuple (i, j) with the indices of the graphs
+    :return: The number of isomorphisms
+    """
+    i, j = pair
+    return test_isomorphism(worker_graphs[i], worker_graphs[j], *worker_options)
 
 
 def count_automorphisms(G):
@@ -114,10 +170,10 @@ def get_partitions(G, H):
     """
     result = dict()
     # graph G
-    for vG in G.vertices:
+    for vG in G.vertex_view:
         add_vertex_to_partitions(result, vG.colornum, vG)
     # graph H
-    for vH in H.vertices:
+    for vH in H.vertex_view:
         add_vertex_to_partitions(result, vH.colornum, vH)
     return result
 
@@ -169,11 +225,11 @@ def initial_coloring(G):
     Calculates the initial coloring based on the degrees of the vertices on a graph
     :param G: The graph
     """
-    for v in G.vertices:
+    for v in G.vertex_view:
         v.colornum = v.degree
 
 def initial_flat_coloring(G):
-    for v in G.vertices:
+    for v in G.vertex_view:
         v.colornum = 0
 
 def coarsest_stable_coloring(G, H, fast):
@@ -193,23 +249,25 @@ def coarsest_stable_coloring(G, H, fast):
     last_key = None
     last_color = get_last_color(partitions)
     # Number of loops equals number of vertices
-    for v in range(len(G.vertices)):
+    for v in range(len(G)):
         for p in list(partitions.keys()):
             color_class = partitions[p]
             update_list = []  # list of (color, vertex, neighbourhood)-tuples
+            new_colors = dict()  # neighbourhood -> color, numbered in order of first occurrence
+            kept = [color_class[0]]
             n_u = get_neighbourhood(color_class[0])
             for i in range(1, len(color_class)):
                 n_v = get_neighbourhood(color_class[i])
-                if not n_u == n_v:
-                    color = get_color_of_neighbourhood(n_v, update_list)
-                    if color != UNKNOWN:
-                        update_list.append((color, color_class[i], n_v))
-                    else:
-                        update_list.append((last_color, color_class[i], n_v))
+                if n_u == n_v:
+                    kept.append(color_class[i])
+                else:
+                    if n_v not in new_colors:
+                        new_colors[n_v] = last_color
                         last_color += 1
+                    update_list.append((new_colors[n_v], color_class[i], n_v))
             # Update the dictionary and the vertices
+            color_class[:] = kept
             for t in update_list:
-                color_class.remove(t[VERTEX])
                 if t[COLOR] in partitions:
                     partitions[t[COLOR]].append(t[VERTEX])
                 else:
@@ -218,14 +276,14 @@ def coarsest_stable_coloring(G, H, fast):
             if fast and len(color_class) % 2 != 0: # Check for unbalanced coloring
                 return (NO, partitions) 
             last_key = p
-        if fast and len(partitions) == len(G.vertices): # Check for bijection
+        if fast and len(partitions) == len(G): # Check for bijection
             return (YES, partitions)
     # Check the resulting color classes for an unbalanced coloring
     for p in range(last_key + 1, len(partitions)):
         if len(partitions[p]) % 2 != 0:
             return (NO, partitions)
     if not fast:
-        if len(partitions) == len(G.vertices): # Check for bijection
+        if len(partitions) == len(G): # Check for bijection
             return (YES, partitions)
     return (MAYBE, partitions)
 
@@ -237,29 +295,74 @@ def find_isomorphisms(G, H, choice, fast):
     :param H: The graph H
     :return: The number of isomorphisms
     """
-    if fast and len(G.vertices) != len(H.vertices):
+    if fast and len(G) != len(H):
         return NO
-    return count_isomorphisms(G, H, [], [], choice, fast)
+    # The copies made by the search have the same structure, so the scope is computed only once
+    scope = (graph_key(CSRGraph.from_graph(G).disjoint_union(CSRGraph.from_graph(H))), fast, backend)
+    return count_isomorphisms(G, H, [], [], choice, fast, scope)
 
 
-def count_isomorphisms(G, H, D, I, choice, fast):
+def coloring_key(G, H):
     """
-    Count the number of isomorphisms with graph G and H
+    Computes a compact key of the coloring of graphs G and H
     :param G: The graph G
     :param H: The graph H
-    :return: The number of isomorphisms
+    :return: The SHA-1 hash of the colors of the vertices, in order
+    """
+    return hashlib.sha1(array('q', [v.colornum for v in G.vertex_view + H.vertex_view]).tobytes()).digest()
+
+
+def vectorised_stable_coloring(G, H):
     """
+    Calculates the coarsest stable coloring on graphs G and H with the NumPy backend
+    (see inleveren/numpy_refinement.py), starting from the colors of the vertices
+    :param G: The graph G
+    :param H: The graph H
+    :return: Tuple (int, dict), as returned by coarsest_stable_coloring
+    """
+    vertices = G.vertex_view + H.vertex_view
+    graph = CSRGraph.from_graph(G).disjoint_union(CSRGraph.from_graph(H))
+    result, colors = numpy_refinement.coarsest_stable_coloring(graph, [v.colornum for v in vertices], len(G))
+    partitions = dict()
+    for v, color in zip(vertices, colors):
+        v.colornum = color
+        add_vertex_to_partitions(partitions, color, v)
+    return (result, partitions)
 
-    color = get_last_color(get_partitions(G, H)) + 1
+
+def count_isomorphisms(G, H, D, I, choice, fast, scope=None):
+    """
+    Count the number of isomorphisms with graph G and H.
+    The result and stable coloring of every refinement are kept in refinement_memo, so that
+    a coloring of the same graphs that was refined before is not refined again.
+    :param G: The graph G
+    :param H: The graph H
+    :param scope: Hashable key of the structure of G and H and the refinement options,
+    or None to refine without the memo
+    :return: The number of isomorphisms
+    """
+    vertices = G.vertex_view + H.vertex_view
+    color = max([v.colornum for v in vertices], default=0) + 1
 
     for vertex in D+I:
         vertex.colornum = color
 
-    (result, partitions) = coarsest_stable_coloring(G, H, fast)
-
-    for p in partitions:
-        if len(partitions[p]) % 2 != 0:
-            return NO
+    key = (scope, coloring_key(G, H)) if scope is not None else None
+    entry = refinement_memo.get(key) if key is not None else None
+    if entry is None:
+        if backend == NUMPY:
+            (result, partitions) = vectorised_stable_coloring(G, H)
+        else:
+            (result, partitions) = coarsest_stable_coloring(G, H, fast)
+        for p in partitions:
+            if len(partitions[p]) % 2 != 0:
+                result = NO
+        if key is not None:
+            refinement_memo.put(key, (result, tuple(v.colornum for v in vertices)))
+    else:
+        (result, colors) = entry
+        for v, c in zip(vertices, colors):
+            v.colornum = c
 
     # Coarsest stable coloring is unbalanced or a bijection
     if result == NO:
@@ -293,7 +396,7 @@ def count_isomorphisms(G, H, D, I, choice, fast):
                 copy_h = H.deepcopy()
                 copy_x = get_copied_vertex(G, copy_g, x)
                 copy_y = get_copied_vertex(H, copy_h, y)
-                num = num + count_isomorphisms(copy_g, copy_h, [copy_x], [copy_y], choice, fast)
+                num = num + count_isomorphisms(copy_g, copy_h, [copy_x], [copy_y], choice, fast, scope)
         return num
 
 
@@ -304,8 +407,8 @@ def verify_colors(G, H):
     :param H: The graph H
     :return: Whether the resulting coloring is a bijection or not
     """
-    for G_v in G.vertices:
-        for H_v in H.vertices:
+    for G_v in G.vertex_view:
+        for H_v in H.vertex_view:
             if G_v.colornum == H_v.colornum:
                 if not get_neighbourhood(G_v) == get_neighbourhood(H_v):
                     return False
@@ -316,11 +419,33 @@ if __name__ == "__main__":
     Main function
     :param 1: The .grl-file
     """
-    USAGE = "Usage:\npython3 " + str(sys.argv[0]) + " [filename] [biggest|smallest|random] [flat|degree]"
+    USAGE = "Usage:\npython3 " + str(sys.argv[0]) + " [filename] [biggest|smallest|random] [flat|degree] [fast|slow] <python|numpy> [-j [processes]] [-c] [-m size]"
+    processes = 1
+    if "-j" in sys.argv:
+        index = sys.argv.index("-j")
+        if index + 1 < len(sys.argv) and sys.argv[index + 1].isdigit():
+            processes = int(sys.argv.pop(index + 1))
+        else:
+            processes = default_processes()
+        sys.argv.pop(index)
+    cache = "-c" in sys.argv
+    if cache:
+        sys.argv.remove("-c")
+    memo_statistics = "-m" in sys.argv
+    if memo_statistics:
+        # Size of the refinement memo; its hits and misses (in this process) are printed at the end
+        index = sys.argv.index("-m")
+        refinement_memo.size = int(sys.argv.pop(index + 1))
+        sys.argv.pop(index)
     start = time.time()
     with open(sys.argv[1]) as f:
         if(str(sys.argv[1]).endswith(".grl")):
-            graph_list = load_graph(f, read_list=True)
+            if cache:
+                # Read the graphs from the binary cache (see inleveren/graph_cache.py)
+                graph_list = ([build_graph(Graph, len(G), [(u, v, None) for u, v in G.edges()])
+                               for G in load_graphs(sys.argv[1])], [])
+            else:
+                graph_list = load_graph(f, read_list=True)
             if(sys.argv[2] == "biggest"):
                 colorclass_choice = BIGGEST
             elif(sys.argv[2] == "random"):
@@ -344,10 +469,19 @@ if __name__ == "__main__":
             else:
                 print (USAGE)
                 exit();
-            refine_all(graph_list, colorclass_choice, coloring_choice, fast)
+            if len(sys.argv) > 5 and sys.argv[5] == "numpy":
+                # NumPy is only needed for this backend
+                import numpy_refinement
+                backend = NUMPY
+            elif len(sys.argv) > 5 and sys.argv[5] != "python":
+                print (USAGE)
+                exit();
+            refine_all(graph_list, colorclass_choice, coloring_choice, fast, processes)
         else:
             graph = load_graph(f, read_list=False)
             count_automorphisms(graph)
 
     end = time.time()
     print(int((end-start)*1000))
+    if memo_statistics:
+        print(refinement_memo)
@@ -5,7 +5,7 @@ for f in  "colorref/colorref_largeexample_4_1026.grl" "colorref/colorref_largeex
             do
             #echo -n $(/usr/bin/time -f"%M" python test_refinement.py "$f" "$m" degree > /dev/null | tr '\n' '\t')
             echo -n "$f","$m",
-            python3 test_refinement.py "$f" "biggest" "$m" "fast"
+            python3 test_refinement.py "$f" "biggest" "$m" "fast" -c
         done
     done    
 done
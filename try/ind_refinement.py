@@ -110,23 +110,10 @@ def initial_coloring(G):
     Calculates the initial coloring based on the degrees of the vertices on a graph
     :param G: The graph
     """
-    for v in G.vertices:
+    for v in G.vertex_view:
         v.colornum = v.degree
 
 
-def get_color_of_neighbourhood(n, lst):
-    """
-    Get the color for which the same colored neighbourhood is already in the list
-    :param n: List of neighbour colors
-    :param lst: The 'update-list' with the following tuples: (color, vertex, neighbourhood)
-    :return: the found color or -1
-    """
-    for i in range(len(lst)):
-        if lst[i][NEIGHBOURS] == n:
-            return lst[i][COLOR]
-    return UNKNOWN
-
-
 def coarsest_stable_coloring(G, H):
     """
     Calculates the coarsest stable coloring on graphs G and H
@@ -144,23 +131,25 @@ def coarsest_stable_coloring(G, H):
     last_key = None
     last_color = helper.get_last_color(partitions)
     # Number of loops equals number of vertices
-    for v in range(len(G.vertices)):
+    for v in range(len(G)):
         for p in list(partitions.keys()):
             color_class = partitions[p]
             update_list = []  # list of (color, vertex, neighbourhood)-tuples
+            new_colors = dict()  # neighbourhood -> color, numbered in order of first occurrence
+            kept = [color_class[0]]
             n_u = helper.get_neighbourhood(color_class[0])
             for i in range(1, len(color_class)):
                 n_v = helper.get_neighbourhood(color_class[i])
-                if not n_u == n_v:
-                    color = get_color_of_neighbourhood(n_v, update_list)
-                    if color != UNKNOWN:
-                        update_list.append((color, color_class[i], n_v))
-                    else:
-                        update_list.append((last_color, color_class[i], n_v))
+                if n_u == n_v:
+                    kept.append(color_class[i])
+                else:
+                    if n_v not in new_colors:
+                        new_colors[n_v] = last_color
                         last_color += 1
+                    update_list.append((new_colors[n_v], color_class[i], n_v))
             # Update the dictionary and the vertices
+            color_class[:] = kept
             for t in update_list:
-                color_class.remove(t[VERTEX])
                 if t[COLOR] in partitions:
                     partitions[t[COLOR]].append(t[VERTEX])
                 else:
@@ -169,7 +158,7 @@ def coarsest_stable_coloring(G, H):
             if len(color_class) % 2 != 0: # Check for unbalanced coloring
                 return (NO, partitions) 
             last_key = p
-        if len(partitions) == len(G.vertices): # Check for bijection
+        if len(partitions) == len(G): # Check for bijection
             return (YES, partitions)
     # Check the resulting color classes for an unbalanced coloring
     for p in range(last_key + 1, len(partitions)):
@@ -185,7 +174,7 @@ def find_isomorphisms(G, H):
     :param H: The graph H
     :return: The number of isomorphisms
     """
-    if not (len(G.vertices) == len(H.vertices)):
+    if not (len(G) == len(H)):
         return NO
     return count_isomorphisms(G, H, [], [])
 
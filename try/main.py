@@ -1,37 +1,43 @@
 import sys
-from graph_io import load_graph, write_dot
+from graph_io import load_graph, write_dot, open_graph_file, resolve_graph_path
 from ind_refinement import find_all_isomorphisms, count_all_automorphisms, count_automorphisms
 
 if __name__ == "__main__":
     """
     Main function
-    :param 1: A .grl or .gr file for computing the isomorphism or automorphism problem
+    :param 1: A .grl or .gr file for computing the isomorphism or automorphism problem, which may be in a
+    zip archive: archive.zip[:member] (set GRAPH_ARCHIVE_PASSWORD for encrypted archives)
     :param 2: (Only with .grl files) -a for computing automorphisms and -i for computing isomorphisms
     """
-    USAGE = "Usage: python3 " + sys.argv[0] + " [filename] <options>"
+    USAGE = "Usage: python3 " + sys.argv[0] + " [filename|archive.zip[:member]] <options>"
     OPTIONS = "options:\t-i or isomorphism\n\t\t-a or automorphisms"
     if len(sys.argv) < 2:
         print(USAGE)
         exit(-1)
-    if (sys.argv[1].endswith(".grl")):
+    try:
+        path = resolve_graph_path(sys.argv[1])
+    except (OSError, ValueError, RuntimeError) as error:
+        print(error)
+        exit(-1)
+    if (path.endswith(".grl")):
         # Graph list
         if sys.argv[2] == "-i" or sys.argv[2] == "isomorphism":
             # Find isomorphisms
-            with open(sys.argv[1]) as f:
+            with open_graph_file(path) as f:
                 graph_list = load_graph(f, read_list = True)
                 find_all_isomorphisms(graph_list[0])
         elif sys.argv[2] == "-a" or sys.argv[2] == "automorphism":
             # Count automorphisms
-            with open(sys.argv[1]) as f:
+            with open_graph_file(path) as f:
                 graph_list = load_graph(f, read_list = True)
                 count_all_automorphisms(graph_list[0])
         else:
             print(USAGE)
             print(OPTIONS)
             exit(-1)
-    elif (sys.argv[1].endswith(".gr")):
+    elif (path.endswith(".gr")):
         # Single graph
-        with open(sys.argv[1]) as f:
+        with open_graph_file(path) as f:
             graph = load_graph(f)
             count_automorphisms(graph, 0)
     else: